@@ -0,0 +1,237 @@
+from datetime import datetime, timezone
+
+from flask import Blueprint, abort, current_app, flash, redirect, render_template, request, url_for
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.sql import func
+
+from models import db, Artist, Show
+from cache import cache
+from loading import load
+from views import apply_changes, availability_response, conflict_response, entity_validator, is_stale, is_upcoming, list_validator
+import conditional
+import genres
+import search
+
+bp = Blueprint('artists', __name__)
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+#  Artists
+#  ----------------------------------------------------------------
+def artist_list():
+  rows = (yield select(Artist.id, Artist.name).order_by(func.lower(Artist.name))).all()
+  return [artist._asdict() for artist in rows]
+
+@bp.route('/artists')
+def artists():
+  # data returned from querying the database
+  def render():
+    data = cache.get_or_set(conditional.cache_key('artists', validator), ('artists',), lambda: load(artist_list()))
+    return render_template('pages/artists.html', artists=data)
+
+  validator = load(list_validator(Artist))
+  return conditional.respond(render, validator, conditional.last_modified(validator[0]), use_modified_since=False)
+
+@bp.route('/artists/search', methods=['GET', 'POST'])
+def search_artists():
+    # ranked search over name, city, state and genres, backed by the full-text
+    # indexes; upcoming show counts come from the same query.
+    # search for "band" should return "The Wild Sax Band".
+    search_term = request.values.get('search_term', '')
+    page = max(request.values.get('page', 1, type=int), 1)
+    total, result_artists = load(search.search(Artist, search_term, page, current_app.config['SEARCH_RESULTS_PER_PAGE']))
+    response={
+        "count": total,
+        "data": []
+        }
+    for artist in result_artists:
+        response["data"].append({
+            "id": artist.id,
+            "name": artist.name,
+            "num_upcoming_shows": artist.num_upcoming_shows,
+        })
+    has_next = page * current_app.config['SEARCH_RESULTS_PER_PAGE'] < total
+
+    return render_template('pages/search_artists.html', results=response, search_term=search_term, page=page, has_next=has_next)
+
+def artist_page(artist_id):
+    # same shape as venue_page: one eager-loaded query, split in memory
+    artist = (yield select(Artist).options(joinedload(Artist.shows).joinedload(Show.venue), selectinload(Artist.genres))
+        .where(Artist.id == artist_id)).unique().scalar_one_or_none()
+    if artist is None:
+        abort(404)
+    now = datetime.now(timezone.utc)
+    data = {
+        "id": artist.id,
+        "name": artist.name,
+        "genres": [genre.name for genre in artist.genres],
+        "city": artist.city,
+        "state": artist.state,
+        "phone": artist.phone,
+        "website": artist.website,
+        "facebook_link": artist.facebook_link,
+        "seeking_venue": artist.seeking_venue,
+        "seeking_description": artist.seeking_description,
+        "image_link": artist.image_link,
+        "past_shows": [],
+        "upcoming_shows": [],
+    }
+    for show in sorted(artist.shows, key=lambda show: show.start_time):
+        shows = data["upcoming_shows"] if is_upcoming(show.start_time, now) else data["past_shows"]
+        shows.append({
+            "venue_id": show.venue_id,
+            "venue_name": show.venue.name,
+            "venue_image_link": show.venue.image_link,
+            "start_time": show.start_time,
+        })
+    data["past_shows_count"] = len(data["past_shows"])
+    data["upcoming_shows_count"] = len(data["upcoming_shows"])
+    return data
+
+@bp.route('/artists/<int:artist_id>')
+def show_artist(artist_id):
+    # shows the artist page with the given artist_id
+    key = 'artist:{}'.format(artist_id)
+
+    def render():
+        data = cache.get_or_set(conditional.cache_key(key, validator), (key,), lambda: load(artist_page(artist_id)))
+        return render_template('pages/show_artist.html', artist=data)
+
+    validator = load(entity_validator(Artist, artist_id))
+    return conditional.respond(render, validator, conditional.last_modified(*validator[:4]))
+
+#  Update
+#  ----------------------------------------------------------------
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+    from forms import ArtistForm
+    form = ArtistForm()
+    artist = Artist.query.get(artist_id)
+    if artist:
+        form.name.data = artist.name
+        form.genres.data = [genre.name for genre in artist.genres]
+        form.city.data = artist.city
+        form.state.data = artist.state
+        form.phone.data = artist.phone
+        form.website_link.data = artist.website
+        form.facebook_link.data = artist.facebook_link
+        form.seeking_venue.data = artist.seeking_venue
+        form.seeking_description.data = artist.seeking_description
+        form.image_link.data = artist.image_link
+        form.version.data = artist.version_id
+
+        # populate form with fields from artist with ID <artist_id>
+        return render_template('forms/edit_artist.html', form=form, artist=artist)
+    return render_template('errors/404.html'), 404
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+    # take values from the form submitted, and update existing
+    # artist record with ID <artist_id> using the new attributes
+
+    from forms import ArtistForm
+
+    form = ArtistForm(request.form)
+    conflict = False
+    if form.validate_on_submit():
+        try:
+            artist = Artist.query.get(artist_id)
+            if is_stale(artist, form.version.data):
+                raise StaleDataError()
+            changed = apply_changes(artist, {
+                'name': form.name.data,
+                'city': form.city.data,
+                'state': form.state.data,
+                'phone': form.phone.data,
+                'facebook_link': form.facebook_link.data,
+                'website': form.website_link.data,
+                'image_link': form.image_link.data,
+                'seeking_venue': form.seeking_venue.data,
+                'seeking_description': form.seeking_description.data,
+            }, form.genres.data)
+
+            if changed:
+                # UPDATE ... WHERE id = ? AND version_id = ?: a concurrent
+                # edit committed in between raises StaleDataError
+                db.session.commit()
+                # venue pages list the artist's name and image
+                venue_ids = [id for (id,) in db.session.query(Show.venue_id).filter(Show.artist_id == artist_id).distinct()]
+                cache.bump('artists', 'artist:{}'.format(artist_id), *('venue:{}'.format(id) for id in venue_ids))
+            # on successful db insert, flash success
+            flash('Artist ' + request.form['name'] + ' was successfully edited!')
+        except StaleDataError:
+            db.session.rollback()
+            conflict = True
+            flash('Artist ' + request.form['name'] + ' was changed by someone else in the meantime. '
+                  'Review the current values and apply your changes again.')
+        except:
+            db.session.rollback()
+            # on unsuccessful db insert, flash an error instead.
+            flash('An error occurred. Artist ' + request.form['name'] + ' could not be edited.')
+            # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+        finally:
+            db.session.close()
+    if conflict:
+        return conflict_response(edit_artist, artist_id)
+    if form.errors != {}:
+        for error_message in form.errors.values():
+            flash(f'An error occurred on {error_message[0]}, Artist ' + request.form['name'] + ' could not be listed.')
+
+    return redirect(url_for('.show_artist', artist_id=artist_id))
+
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@bp.route('/artists/create', methods=['GET'])
+def create_artist_form():
+    from forms import ArtistForm
+    form = ArtistForm()
+    return render_template('forms/new_artist.html', form=form)
+
+@bp.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+    # called upon submitting the new artist listing form
+    # insert form data as a new Venue record in the db, instead
+    # modify data to be the data object returned from db insertion
+    from forms import ArtistForm
+    form = ArtistForm(request.form)
+    if form.validate_on_submit():
+        new_artist = Artist(
+            name = form.name.data,
+            city = form.city.data,
+            state = form.state.data,
+            phone = form.phone.data,
+            facebook_link = form.facebook_link.data,
+            website = form.website_link.data,
+            image_link = form.image_link.data,
+            seeking_venue = form.seeking_venue.data,
+            seeking_description = form.seeking_description.data,
+        )
+
+        try:
+            genres.assign(new_artist, form.genres.data)
+            db.session.add(new_artist)
+            db.session.commit()
+            cache.bump('artists')
+            flash('Artist ' + request.form['name'] + ' was successfully listed!')
+        except:
+            db.session.rollback()
+            flash('An error occurred. Artist ' + request.form['name'] + ' could not be listed.')
+            # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+        finally:
+            db.session.close()
+    if form.errors != {}:
+        for error_message in form.errors.values():
+            flash(f'An error occurred on {error_message[0]}, Artist ' + request.form['name'] + ' could not be listed.')
+
+    return redirect(url_for('pages.index'))
+
+
+@bp.route('/artists/<int:artist_id>/availability')
+def artist_availability(artist_id):
+    return availability_response(Artist, artist_id)
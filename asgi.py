@@ -0,0 +1,209 @@
+import os
+import random
+
+from flask import g, render_template, request
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware.wsgi import WSGIMiddleware, build_environ
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+
+from app import create_app
+from artists import artist_list, artist_page
+from cache import cache
+from loading import load_async
+from models import Venue, Artist, Show
+from pages import recent_listings
+from shows import shows_args, shows_page
+from venues import venue_areas, venue_page
+from views import entity_validator, list_validator
+import conditional
+import routing
+import search
+
+#----------------------------------------------------------------------------#
+# ASGI entry point.
+#
+#   uvicorn asgi:application
+#
+# The read views (index, venue / artist lists and pages, shows, search) run
+# as coroutines on SQLAlchemy's asyncio engine (asyncpg, or aiosqlite for
+# local SQLite databases), so a worker waiting on the database keeps serving
+# other requests. They run the loaders of the blueprints and render the same
+# templates inside a Flask request context, with the same cache keys,
+# conditional GET and after_request hooks. What still blocks, rendering,
+# the Flask hooks and Redis round trips, runs in the threadpool so the
+# event loop stays free. Everything else, the write paths included, falls
+# through to the sync Flask app.
+#----------------------------------------------------------------------------#
+
+# a production server, like wsgi.py
+app = create_app(os.getenv('FLASK_ENV') or 'production')
+
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def create_engine(uri):
+    url = make_url(uri)
+    return create_async_engine(url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()]),
+                               **app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+
+
+primary = create_engine(app.config['SQLALCHEMY_DATABASE_URI'])
+replicas = dict(zip(routing.replica_keys(app), map(create_engine, app.config['SQLALCHEMY_REPLICA_URIS'])))
+Session = sessionmaker(class_=AsyncSession, expire_on_commit=False)
+
+
+def session():
+    # same routing as routing.request_bind: reads go to a random replica
+    # unless the client is pinned to the primary by a recent write
+    key = None
+    if replicas and request.method in routing.READ_METHODS and routing.STICKY_COOKIE not in request.cookies:
+        key = random.choice(list(replicas))
+    g.db_bind = key
+    return Session(bind=replicas[key] if key else primary)
+
+#----------------------------------------------------------------------------#
+# Views.
+#----------------------------------------------------------------------------#
+
+async def index(db):
+    async def render():
+        recent_venues, recent_artists = await cache.get_or_set_async(
+            conditional.cache_key('index', validator), ('venues', 'artists'), lambda: load_async(recent_listings(), db))
+        return await run_in_threadpool(render_template, 'pages/home.html', venues=recent_venues, artists=recent_artists)
+
+    validator = await load_async(list_validator(Venue, Artist), db)
+    return await conditional.respond_async(render, validator, conditional.last_modified(*validator[::2]), use_modified_since=False)
+
+
+async def venues(db):
+    state = request.args.get('state')
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = app.config['VENUES_PER_PAGE']
+
+    async def render():
+        data, states, has_next = await cache.get_or_set_async(
+            conditional.cache_key('venues:{}:{}:{}'.format(state, page, per_page), validator), ('venues',),
+            lambda: load_async(venue_areas(state, page, per_page), db),
+        )
+        return await run_in_threadpool(render_template, 'pages/venues.html', areas=data, states=states, state=state,
+                                       page=page, has_next=has_next)
+
+    validator = await load_async(list_validator(Venue), db)
+    return await conditional.respond_async(render, validator, conditional.last_modified(validator[0]), use_modified_since=False)
+
+
+async def show_venue(db, venue_id):
+    key = 'venue:{}'.format(venue_id)
+
+    async def render():
+        data = await cache.get_or_set_async(
+            conditional.cache_key(key, validator), (key,), lambda: load_async(venue_page(venue_id), db))
+        return await run_in_threadpool(render_template, 'pages/show_venue.html', venue=data)
+
+    validator = await load_async(entity_validator(Venue, venue_id), db)
+    return await conditional.respond_async(render, validator, conditional.last_modified(*validator[:4]))
+
+
+async def artists(db):
+    async def render():
+        data = await cache.get_or_set_async(
+            conditional.cache_key('artists', validator), ('artists',), lambda: load_async(artist_list(), db))
+        return await run_in_threadpool(render_template, 'pages/artists.html', artists=data)
+
+    validator = await load_async(list_validator(Artist), db)
+    return await conditional.respond_async(render, validator, conditional.last_modified(validator[0]), use_modified_since=False)
+
+
+async def show_artist(db, artist_id):
+    key = 'artist:{}'.format(artist_id)
+
+    async def render():
+        data = await cache.get_or_set_async(
+            conditional.cache_key(key, validator), (key,), lambda: load_async(artist_page(artist_id), db))
+        return await run_in_threadpool(render_template, 'pages/show_artist.html', artist=data)
+
+    validator = await load_async(entity_validator(Artist, artist_id), db)
+    return await conditional.respond_async(render, validator, conditional.last_modified(*validator[:4]))
+
+
+async def shows(db):
+    async def render():
+        rows, next_cursor = await load_async(shows_page(*shows_args()), db)
+        data = [{
+            "venue_id": show.venue_id,
+            "venue_name": show.venue_name,
+            "artist_id": show.artist_id,
+            "artist_name": show.artist_name,
+            "artist_image_link": show.artist_image_link,
+            "start_time": show.start_time,
+        } for show in rows]
+        return await run_in_threadpool(render_template, 'pages/shows.html', shows=data, next_cursor=next_cursor)
+
+    validator = await load_async(list_validator(Show, Venue, Artist), db)
+    return await conditional.respond_async(render, validator, conditional.last_modified(*validator[::2]), use_modified_since=False)
+
+
+def search_view(model, template):
+    async def view(db):
+        search_term = request.values.get('search_term', '')
+        page = max(request.values.get('page', 1, type=int), 1)
+        per_page = app.config['SEARCH_RESULTS_PER_PAGE']
+        total, rows = await load_async(search.search(model, search_term, page, per_page, db.bind.dialect.name), db)
+        results = {
+            "count": total,
+            "data": [{"id": row.id, "name": row.name, "num_upcoming_shows": row.num_upcoming_shows} for row in rows],
+        }
+        return await run_in_threadpool(render_template, template, results=results, search_term=search_term,
+                                       page=page, has_next=page * per_page < total)
+    return view
+
+#----------------------------------------------------------------------------#
+# Dispatch.
+#----------------------------------------------------------------------------#
+
+def endpoint(view):
+    # runs view inside a Flask request context built from the ASGI request,
+    # the way Flask.wsgi_app / full_dispatch_request would, and converts
+    # the Flask response back
+    async def handle(scope_request):
+        context = app.request_context(build_environ(scope_request.scope, await scope_request.body()))
+        context.push()
+        try:
+            try:
+                response = await run_in_threadpool(app.preprocess_request)
+                if response is None:
+                    async with session() as db:
+                        response = await view(db, **scope_request.path_params)
+            except Exception as e:
+                response = await run_in_threadpool(app.handle_user_exception, e)
+            response = await run_in_threadpool(app.finalize_request, response)
+        except Exception as e:
+            response = await run_in_threadpool(app.handle_exception, e)
+        finally:
+            context.pop()
+        converted = Response(response.get_data(), status_code=response.status_code)
+        converted.raw_headers = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                 for name, value in response.headers.items()]
+        return converted
+    return handle
+
+
+application = Starlette(routes=[
+    Route('/', endpoint(index)),
+    Route('/venues', endpoint(venues)),
+    Route('/venues/search', endpoint(search_view(Venue, 'pages/search_venues.html')), methods=['GET', 'POST']),
+    Route('/venues/{venue_id:int}', endpoint(show_venue)),
+    Route('/artists', endpoint(artists)),
+    Route('/artists/search', endpoint(search_view(Artist, 'pages/search_artists.html')), methods=['GET', 'POST']),
+    Route('/artists/{artist_id:int}', endpoint(show_artist)),
+    Route('/shows', endpoint(shows)),
+    Mount('', WSGIMiddleware(app)),
+])
@@ -0,0 +1,216 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+import click
+from flask import Blueprint, Response, abort, current_app, request, send_from_directory, url_for
+from flask.cli import AppGroup
+
+#----------------------------------------------------------------------------#
+# Static asset pipeline.
+#
+# `flask assets build` concatenates and minifies the BUNDLES into
+# static/dist/ under content-hashed names (main.3f2a9c01b4de.css) with
+# .gz and .br variants next to them, and records the names in
+# static/dist/manifest.json. Templates link assets with static_url(name):
+# the hashed file once built, served with a year-long immutable
+# Cache-Control and the precompressed variant the client accepts. In debug
+# mode, or before the first build, bundles are assembled per request
+# instead, so edits under static/ show up on reload.
+#----------------------------------------------------------------------------#
+
+bp = Blueprint('assets', __name__)
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+
+# bundle name -> source files under static/, in load order
+BUNDLES = {
+    'main.css': [
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ],
+    'head.js': [
+        'js/libs/modernizr-2.8.2.min.js',
+        'js/libs/moment.min.js',
+        'js/script.js',
+    ],
+    'main.js': [
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js',
+    ],
+    # loaded on their own: the CDN fallback and the IE < 9 polyfill
+    'jquery.js': ['js/libs/jquery-1.11.1.min.js'],
+    'respond.js': ['js/libs/respond-1.4.2.min.js'],
+}
+
+# (encoding, file suffix), in order of preference
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+CSS_COMMENT = re.compile(r'/\*(?!!).*?\*/', re.S)
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+JS_LINE_COMMENT = re.compile(r'^\s*//.*$', re.M)
+
+
+def _rebase_urls(css, source):
+    # relative url()s point next to the source file; rewrite them relative to dist/
+    def rebase(match):
+        quote, url = match.groups()
+        if re.match(r'^(?:[a-z]+:|/|#)', url, re.I):
+            return match.group(0)
+        path = posixpath.normpath(posixpath.join(posixpath.dirname(source), url))
+        return 'url({0}{1}{0})'.format(quote, posixpath.relpath(path, DIST))
+    return CSS_URL.sub(rebase, css)
+
+
+def minify_css(css):
+    # comments (license /*! ... */ blocks are kept) and insignificant whitespace
+    css = CSS_COMMENT.sub('', css)
+    css = re.sub(r'\s+', ' ', css)
+    css = CSS_PUNCTUATION.sub(r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+def minify_js(js):
+    # conservative: whole-line comments (source map links included),
+    # indentation and blank lines; the libraries ship minified already
+    js = JS_LINE_COMMENT.sub('', js)
+    return '\n'.join(line.strip() for line in js.splitlines() if line.strip())
+
+
+def bundle(static_folder, name, minify=True):
+    parts = []
+    for source in BUNDLES[name]:
+        with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+            text = f.read()
+        if name.endswith('.css'):
+            parts.append(_rebase_urls(text, source))
+        else:
+            parts.append(text)
+    if name.endswith('.css'):
+        text = '\n'.join(parts)
+        return minify_css(text) if minify else text
+    # `;` between scripts, in case one ends without it
+    return '\n;\n'.join(minify_js(part) if minify else part for part in parts)
+
+
+def _compress(data):
+    variants = {'.gz': gzip.compress(data, 9, mtime=0)}
+    try:
+        import brotli
+    except ImportError:
+        return variants
+    variants['.br'] = brotli.compress(data, quality=11)
+    return variants
+
+
+def build(static_folder):
+    dist = os.path.join(static_folder, DIST)
+    os.makedirs(dist, exist_ok=True)
+    manifest, written = {}, {MANIFEST}
+    for name in BUNDLES:
+        data = bundle(static_folder, name).encode('utf-8')
+        stem, ext = os.path.splitext(name)
+        hashed = '{}.{}{}'.format(stem, hashlib.sha256(data).hexdigest()[:12], ext)
+        files = dict(_compress(data), **{'': data})
+        for suffix, content in files.items():
+            with open(os.path.join(dist, hashed + suffix), 'wb') as f:
+                f.write(content)
+            written.add(hashed + suffix)
+        manifest[name] = {"file": hashed, "size": len(data),
+                          "encodings": {suffix[1:]: len(content) for suffix, content in files.items() if suffix}}
+    # drop the files of earlier builds
+    for filename in os.listdir(dist):
+        if filename not in written:
+            os.remove(os.path.join(dist, filename))
+    with open(os.path.join(dist, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(app):
+    try:
+        with open(os.path.join(app.static_folder, DIST, MANIFEST)) as f:
+            return {name: entry['file'] for name, entry in json.load(f).items()}
+    except FileNotFoundError:
+        if not app.debug:
+            app.logger.warning('static assets are not built: run `flask assets build`')
+        return {}
+
+
+def static_url(name):
+    # hashed URL of a bundle once built, the live bundle before; other files
+    # under static/ go through the regular static route
+    manifest = current_app.extensions['assets']
+    if name in manifest:
+        return url_for('assets.dist', filename=manifest[name])
+    if name in BUNDLES:
+        return url_for('assets.live', name=name)
+    return url_for('static', filename=name)
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+@bp.route('/static/dist/<path:filename>')
+def dist(filename):
+    folder = os.path.join(current_app.static_folder, DIST)
+    mimetype = mimetypes.guess_type(filename)[0]
+    # precompressed variant when accepted; the name changes with the content,
+    # so the client never needs to revalidate
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding] > 0 and os.path.isfile(os.path.join(folder, filename + suffix)):
+            response = send_from_directory(folder, filename + suffix, mimetype=mimetype, conditional=True)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(folder, filename, mimetype=mimetype, conditional=True)
+    response.vary.add('Accept-Encoding')
+    # send_file marks responses no-cache unless SEND_FILE_MAX_AGE_DEFAULT is set
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = current_app.config['STATIC_IMMUTABLE_MAX_AGE']
+    response.cache_control.immutable = True
+    return response
+
+@bp.route('/static/bundle/<name>')
+def live(name):
+    # unbuilt bundle, assembled on each request (debug mode / before a build)
+    if name not in BUNDLES:
+        abort(404)
+    response = Response(bundle(current_app.static_folder, name, minify=False),
+                        mimetype=mimetypes.guess_type(name)[0])
+    response.cache_control.no_cache = True
+    return response
+
+#----------------------------------------------------------------------------#
+# CLI.
+#----------------------------------------------------------------------------#
+
+cli = AppGroup('assets', help='Build the static asset bundles.')
+
+
+@cli.command('build')
+def build_command():
+    """Bundle, minify, fingerprint and precompress the static assets."""
+    manifest = build(current_app.static_folder)
+    for name, entry in manifest.items():
+        encodings = ', '.join('{} {}'.format(encoding, size) for encoding, size in sorted(entry['encodings'].items()))
+        click.echo('{:<12} {:<28} {:>8} bytes ({})'.format(name, entry['file'], entry['size'], encodings))
+    if not all('br' in entry['encodings'] for entry in manifest.values()):
+        click.echo('brotli is not installed: only gzip variants were written', err=True)
+
+
+def init_app(app):
+    # debug mode always serves the live bundles
+    app.extensions['assets'] = {} if app.debug else load_manifest(app)
+    app.add_template_global(static_url)
+    app.register_blueprint(bp)
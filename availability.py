@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import and_, func, literal, select
+
+from counters import SHOW_KEYS
+from models import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Show scheduling: double-booking checks and availability.
+#
+# A venue hosts one show at a time and an artist plays one show at a time,
+# so the shows of a venue (or of an artist) are disjoint intervals, and
+# sorted by start_time through the (venue_id, start_time) / (artist_id,
+# start_time) indexes they form a sorted interval list. The only shows that
+# can overlap [start, end) are the last one starting at or before `start`
+# and those starting inside the interval: one index seek, whatever the
+# number of shows. The database enforces the same rule (see the
+# show_end_time migration), which also covers concurrent inserts.
+#----------------------------------------------------------------------------#
+
+
+def as_utc(value):
+    # naive timestamps (SQLite) are stored as UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def is_overlap_error(error):
+    # a DBAPIError raised by the show_end_time migration's constraints:
+    # exclusion_violation on PostgreSQL, the triggers' RAISE(ABORT) on SQLite
+    orig = getattr(error, 'orig', error)
+    return getattr(orig, 'pgcode', None) == '23P01' or 'show overlaps another show' in str(orig)
+
+
+def default_end(start_time):
+    return start_time + timedelta(minutes=current_app.config['SHOW_DEFAULT_MINUTES'])
+
+
+def overlap_condition(model, id, start_time, end_time):
+    # WHERE clause for the shows of the venue / artist overlapping [start_time, end_time)
+    key = SHOW_KEYS[model]
+    latest_start = select(func.max(Show.start_time)) \
+        .where(key == id, Show.start_time <= start_time) \
+        .scalar_subquery()
+    return and_(key == id,
+                Show.start_time >= func.coalesce(latest_start, literal(start_time, Show.start_time.type)),
+                Show.start_time < end_time,
+                Show.end_time > start_time)
+
+
+def overlapping(model, id, start_time, end_time):
+    return db.session.query(Show).filter(overlap_condition(model, id, start_time, end_time)).order_by(Show.start_time)
+
+
+def conflict(venue_id, artist_id, start_time, end_time):
+    # why a show can't be booked at [start_time, end_time), or None
+    for model, id, label in ((Venue, venue_id, 'venue'), (Artist, artist_id, 'artist')):
+        show = overlapping(model, id, start_time, end_time).first()
+        if show is not None:
+            return 'the {} is already booked from {:%Y-%m-%d %H:%M} to {:%Y-%m-%d %H:%M}'.format(
+                label, show.start_time, show.end_time)
+    return None
+
+
+def parse_time(value, default):
+    # ISO 8601, naive means UTC; raises ValueError
+    if not value:
+        return default
+    return as_utc(datetime.fromisoformat(value))
+
+
+def calendar(model, id, start_time, end_time):
+    # booked shows and free gaps within [start_time, end_time)
+    booked, free = [], []
+    cursor = start_time
+    for show in overlapping(model, id, start_time, end_time):
+        show_start, show_end = as_utc(show.start_time), as_utc(show.end_time)
+        if show_start > cursor:
+            free.append({"start_time": cursor.isoformat(), "end_time": show_start.isoformat()})
+        cursor = max(cursor, show_end)
+        booked.append({
+            "show_id": show.id,
+            "venue_id": show.venue_id,
+            "artist_id": show.artist_id,
+            "start_time": show_start.isoformat(),
+            "end_time": show_end.isoformat(),
+        })
+    if cursor < end_time:
+        free.append({"start_time": cursor.isoformat(), "end_time": end_time.isoformat()})
+    return booked, free
@@ -0,0 +1,69 @@
+#----------------------------------------------------------------------------#
+# Micro-benchmark of the `datetime` Jinja filter.
+#
+# Compares the previous filter (strftime in the view, dateutil re-parse and a
+# Babel pattern compilation per row) with filters.format_datetime on a page
+# of shows, cold (empty memo) and warm (page rendered again).
+#
+#   python benchmarks/datetime_filter.py [--rows 500] [--repeat 20]
+#----------------------------------------------------------------------------#
+
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+
+import babel.dates
+import dateutil.parser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import filters
+
+
+def legacy_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    start = datetime(2026, 1, 1, 20, 0, tzinfo=timezone.utc)
+    values = [start + timedelta(hours=7 * i) for i in range(args.rows)]
+    strings = [value.strftime("%Y-%m-%dT%H:%M:%S.%f%z") for value in values]
+
+    def legacy_page():
+        for value in strings:
+            legacy_format_datetime(value, 'full')
+
+    def page():
+        for value in values:
+            filters.format_datetime_cached(value, 'full', 'en', 'UTC')
+
+    def cold_page():
+        filters.format_datetime_cached.cache_clear()
+        page()
+
+    assert legacy_format_datetime(strings[0], 'full') == filters.format_datetime_cached(values[0], 'full', 'en', 'UTC')
+
+    results = [
+        ('legacy (dateutil + babel per row)', min(timeit.repeat(legacy_page, number=1, repeat=args.repeat))),
+        ('precompiled, cold memo', min(timeit.repeat(cold_page, number=1, repeat=args.repeat))),
+        ('precompiled, warm memo', min(timeit.repeat(page, number=1, repeat=args.repeat))),
+    ]
+    baseline = results[0][1]
+    print('{} rows, best of {}'.format(args.rows, args.repeat))
+    for name, seconds in results:
+        print('  {:<36} {:8.2f} ms  {:6.1f}x'.format(name, seconds * 1000, baseline / seconds))
+
+
+if __name__ == '__main__':
+    main()
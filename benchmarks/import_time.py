@@ -0,0 +1,104 @@
+#----------------------------------------------------------------------------#
+# Import-time benchmark.
+#
+# Starts fresh interpreters that import app and call create_app(), the way
+# a worker or a `flask` command starts, under `python -X importtime`, and
+# reports the best of --runs: total import time, create_app() time and the
+# packages that take longest to import. Fails when a module that should be imported
+# lazily (LAZY) shows up at startup, when the total goes over --max-ms, or
+# when it regresses by more than --tolerance against the saved baseline.
+#
+#   python benchmarks/import_time.py [--runs 5] [--top 15]
+#   python benchmarks/import_time.py --save-baseline
+#----------------------------------------------------------------------------#
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+BASELINE = os.path.join(BASELINES, 'import-time.json')
+# absolute slack on top of --tolerance, for noisy machines
+SLACK_MS = 15.0
+
+# only needed by some requests / commands: forms, dates, recurrences, migrations
+LAZY = ('alembic', 'babel', 'dateutil', 'flask_migrate', 'flask_wtf', 'forms', 'pytz', 'wtforms')
+
+CHILD = '''
+import time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+print((imported - started) * 1000, (time.perf_counter() - imported) * 1000)
+'''
+
+# import time:  self [us] | cumulative | imported package
+LINE = re.compile(r'^import time:\s+(\d+) \|\s+\d+ \| *(\S+)$')
+
+
+def measure():
+    env = dict(os.environ, SECRET_KEY=os.environ.get('SECRET_KEY', 'benchmark'))
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', CHILD], cwd=ROOT, env=env,
+                             capture_output=True, text=True)
+    if process.returncode:
+        sys.exit(process.stderr)
+    modules, packages = set(), {}
+    for line in process.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            name = match.group(2)
+            modules.add(name)
+            # self time summed per top-level package: what each dependency costs
+            package = name.split('.')[0]
+            packages[package] = packages.get(package, 0.0) + int(match.group(1)) / 1000
+    import_ms, create_app_ms = map(float, process.stdout.split())
+    return {"import_ms": import_ms, "create_app_ms": create_app_ms, "modules": modules, "packages": packages}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters; the fastest run counts.')
+    parser.add_argument('--top', type=int, default=15, help='Slowest packages to list.')
+    parser.add_argument('--max-ms', type=float, help='Fail when importing app takes longer.')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed regression (0.2 = +20%%).')
+    parser.add_argument('--save-baseline', action='store_true', help='Store this run as the baseline.')
+    args = parser.parse_args()
+
+    measure()  # warm the bytecode and OS caches
+    best = min((measure() for _ in range(args.runs)), key=lambda run: run['import_ms'] + run['create_app_ms'])
+    total = best['import_ms'] + best['create_app_ms']
+    print('import app {:.1f} ms, create_app() {:.1f} ms, best of {}'.format(best['import_ms'], best['create_app_ms'], args.runs))
+    print('  {:<32} {:>9}'.format('package', 'ms'))
+    for name, ms in sorted(best['packages'].items(), key=lambda item: -item[1])[:args.top]:
+        print('  {:<32} {:9.1f}'.format(name, ms))
+
+    failures = []
+    eager = sorted({name for name in best['modules'] if name.split('.')[0] in LAZY})
+    if eager:
+        failures.append('imported at startup: {}'.format(', '.join(eager)))
+    if args.max_ms is not None and total > args.max_ms:
+        failures.append('{:.1f} ms over --max-ms {:.1f}'.format(total, args.max_ms))
+    if os.path.exists(BASELINE) and not args.save_baseline:
+        with open(BASELINE) as f:
+            baseline = json.load(f)
+        allowed = (baseline['import_ms'] + baseline['create_app_ms']) * (1 + args.tolerance) + SLACK_MS
+        print('vs baseline {:+.0%}'.format(total / (baseline['import_ms'] + baseline['create_app_ms']) - 1))
+        if total > allowed:
+            failures.append('{:.1f} ms, baseline allows {:.1f}'.format(total, allowed))
+
+    if args.save_baseline:
+        os.makedirs(BASELINES, exist_ok=True)
+        with open(BASELINE, 'w') as f:
+            json.dump({"import_ms": best['import_ms'], "create_app_ms": best['create_app_ms']}, f, indent=2, sort_keys=True)
+        print('baseline written to {}'.format(BASELINE))
+    if failures:
+        sys.exit('import-time regressions: {}'.format('; '.join(failures)))
+
+
+if __name__ == '__main__':
+    main()
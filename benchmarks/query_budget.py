@@ -0,0 +1,140 @@
+#----------------------------------------------------------------------------#
+# Query-budget check per route.
+#
+# Seeds scratch SQLite databases of increasing size with `flask seed`,
+# serves each route once with a cold cache and counts the SQL statements it
+# issued (the X-SQL-Stats header of metrics.py). A route fails when it goes
+# over its declared budget or when its count changes with the data size,
+# which is what an N+1 (a query per row) looks like.
+#
+#   python benchmarks/query_budget.py [--sizes 1,10] [--keep]
+#----------------------------------------------------------------------------#
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# statements per request, cold cache; must not depend on the data size
+BUDGETS = {
+    'index': 3,
+    'venues': 3,
+    'venues_state': 3,
+    'artists': 2,
+    'shows': 2,
+    'shows_json': 1,
+    'search_venues': 1,
+    'search_artists': 1,
+    'search_suggest': 2,
+    'show_venue': 3,
+    'show_artist': 3,
+    'availability': 2,
+    'genres': 2,
+    'show_genre': 5,
+}
+
+# venues, artists, shows at size 1
+BASE_SIZE = (20, 40, 400)
+
+
+def routes(venue_id, artist_id, word):
+    # (name, method, url, form data)
+    return [
+        ('index', 'GET', '/', None),
+        ('venues', 'GET', '/venues', None),
+        ('venues_state', 'GET', '/venues?state=CA', None),
+        ('artists', 'GET', '/artists', None),
+        ('shows', 'GET', '/shows', None),
+        ('shows_json', 'GET', '/shows.json', None),
+        ('search_venues', 'POST', '/venues/search', {"search_term": word}),
+        ('search_artists', 'POST', '/artists/search', {"search_term": word}),
+        ('search_suggest', 'GET', '/search/suggest?q={}'.format(word[:3]), None),
+        ('show_venue', 'GET', '/venues/{}'.format(venue_id), None),
+        ('show_artist', 'GET', '/artists/{}'.format(artist_id), None),
+        ('availability', 'GET', '/venues/{}/availability'.format(venue_id), None),
+        ('genres', 'GET', '/genres', None),
+        ('show_genre', 'GET', '/genres/Rock n Roll', None),
+    ]
+
+
+def measure(scale):
+    # runs in a child process whose SQLALCHEMY_DATABASE_URI is a fresh file
+    sys.path.insert(0, ROOT)
+    import flask_migrate
+    from app import create_app
+    app = create_app()
+    from models import db, Venue, Artist
+
+    venues, artists, shows = (count * scale for count in BASE_SIZE)
+    with app.app_context():
+        flask_migrate.upgrade(directory=os.path.join(ROOT, 'migrations'))
+    result = app.test_cli_runner().invoke(args=['seed', '--venues', str(venues), '--artists', str(artists), '--shows', str(shows)])
+    if result.exit_code:
+        sys.exit(result.output)
+
+    app.config['METRICS_DEBUG_HEADER'] = True
+    with app.app_context():
+        # the busiest venue and artist, so detail pages grow with the data
+        venue_id = db.session.query(Venue.id).order_by((Venue.upcoming_shows_count + Venue.past_shows_count).desc()).first()[0]
+        artist_id = db.session.query(Artist.id).order_by((Artist.upcoming_shows_count + Artist.past_shows_count).desc()).first()[0]
+        word = db.session.query(Venue.name).first()[0].split()[1]
+
+    client = app.test_client()
+    counts = {}
+    for name, method, url, data in routes(venue_id, artist_id, word):
+        response = client.open(url, method=method, data=data)
+        if response.status_code != 200:
+            sys.exit('{} {} -> {}'.format(method, url, response.status_code))
+        counts[name] = int(re.search(r'queries=(\d+)', response.headers['X-SQL-Stats']).group(1))
+    print(json.dumps(counts))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='1,10', help='Dataset scales to compare, comma-separated.')
+    parser.add_argument('--keep', action='store_true', help='Keep the scratch databases.')
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return measure(args.child)
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    workdir = tempfile.mkdtemp(prefix='fyyur-budget-')
+    counts = {}
+    try:
+        for size in sizes:
+            env = dict(os.environ, SQLALCHEMY_DATABASE_URI='sqlite:///{}'.format(os.path.join(workdir, '{}.db'.format(size))),
+                       SQLALCHEMY_REPLICA_URIS='', CACHE_BACKEND='memory')
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', str(size)],
+                                    env=env, cwd=ROOT, check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+            counts[size] = json.loads(output.strip().splitlines()[-1])
+    finally:
+        if args.keep:
+            print('databases kept in {}'.format(workdir))
+        else:
+            shutil.rmtree(workdir)
+
+    failures = []
+    print('  {:<16} {:>6}  {}'.format('route', 'budget', '  '.join('x{:<4}'.format(size) for size in sizes)))
+    for name, budget in BUDGETS.items():
+        row = [counts[size][name] for size in sizes]
+        status = ''
+        if max(row) > budget:
+            status = 'OVER BUDGET'
+        elif len(set(row)) > 1:
+            status = 'SCALES WITH DATA'
+        if status:
+            failures.append(name)
+        print('  {:<16} {:>6}  {}  {}'.format(name, budget, '  '.join('{:<5}'.format(count) for count in row), status))
+    if failures:
+        sys.exit('query budget exceeded: {}'.format(', '.join(failures)))
+
+
+if __name__ == '__main__':
+    main()
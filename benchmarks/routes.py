@@ -0,0 +1,230 @@
+#----------------------------------------------------------------------------#
+# Route-level benchmark suite.
+#
+# Drives every route of the app through the Flask test client against the
+# database in SQLALCHEMY_DATABASE_URI (SQLite or a local PostgreSQL, filled
+# with `flask seed`) and reports p50 / p95 / p99 latency and throughput per
+# route. Baselines are stored per database backend; a run whose p95 exceeds
+# the baseline by more than --tolerance fails with exit status 1.
+#
+# Write routes really write: run it against a scratch database.
+#
+#   python benchmarks/routes.py [--requests 200] [--only venues,shows]
+#   python benchmarks/routes.py --save-baseline
+#----------------------------------------------------------------------------#
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import create_app
+from models import db, Genre, Venue, Artist
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+# absolute slack on top of --tolerance, so sub-millisecond routes don't flap
+SLACK_MS = 1.0
+
+
+class Sample:
+    # ids and values the requests pick from, read once from the database
+    def __init__(self, rng):
+        self.rng = rng
+        self.venue_ids = [id for (id,) in db.session.query(Venue.id)]
+        self.artist_ids = [id for (id,) in db.session.query(Artist.id)]
+        self.states = [state for (state,) in db.session.query(Venue.state).distinct()]
+        self.genres = [name for (name,) in db.session.query(Genre.name)]
+        self.words = [name.split()[1] for (name,) in db.session.query(Venue.name).limit(200) if len(name.split()) > 1]
+        if not (self.venue_ids and self.artist_ids):
+            sys.exit('the database is empty: run `flask seed` first')
+        self.counter = 0
+        self.bench_venue_ids = None
+
+    def venue(self):
+        return self.rng.choice(self.venue_ids)
+
+    def artist(self):
+        return self.rng.choice(self.artist_ids)
+
+    def word(self):
+        return self.rng.choice(self.words or ['the'])
+
+    def unique(self, prefix):
+        self.counter += 1
+        return '{} {} {}'.format(prefix, os.getpid(), self.counter)
+
+
+def venue_form(sample):
+    return {"name": sample.unique('Bench Venue'), "city": 'Austin', "state": 'TX', "address": '1 Main St',
+            "genres": ['Jazz', 'Blues'], "facebook_link": 'https://www.facebook.com/bench'}
+
+
+def artist_form(sample):
+    return {"name": sample.unique('Bench Artist'), "city": 'Austin', "state": 'TX', "genres": ['Rock n Roll'],
+            "facebook_link": 'https://www.facebook.com/bench', "website_link": 'https://bench.example.com'}
+
+
+def show_form(sample):
+    start_time = datetime.now(timezone.utc) + timedelta(days=sample.rng.randint(-90, 90))
+    return {"venue_id": sample.venue(), "artist_id": sample.artist(),
+            "start_time": start_time.strftime('%Y-%m-%d %H:%M:%S')}
+
+
+class JsonBody(dict):
+    # a request body sent as JSON instead of form data
+    pass
+
+
+def shows_batch(sample):
+    # a single show and a weekly one bounded by UNTIL (RFC 5545, UTC), so a
+    # dateutil that mishandles either shows up as rejected rows
+    start_time = datetime.now(timezone.utc) + timedelta(days=sample.rng.randint(200, 400), hours=sample.rng.randint(0, 23))
+    until = (start_time + timedelta(weeks=6)).strftime('%Y%m%dT%H%M%SZ')
+    return JsonBody(shows=[
+        {"venue_id": sample.venue(), "artist_id": sample.artist(), "start_time": start_time.isoformat()},
+        {"venue_id": sample.venue(), "artist_id": sample.artist(), "start_time": start_time.isoformat(),
+         "rrule": 'FREQ=WEEKLY;UNTIL={}'.format(until)},
+    ])
+
+
+def bench_venue(sample):
+    # venues created by the create_venue benchmark, deleted one per request
+    if sample.bench_venue_ids is None:
+        sample.bench_venue_ids = [id for (id,) in db.session.query(Venue.id).filter(Venue.name.like('Bench Venue %'))]
+    return sample.bench_venue_ids.pop() if sample.bench_venue_ids else sample.venue()
+
+
+# (name, method, path, form data): path and data are callables of the sample
+ROUTES = [
+    ('index', 'GET', lambda s: '/', None),
+    ('venues', 'GET', lambda s: '/venues', None),
+    ('venues_state', 'GET', lambda s: '/venues?state={}'.format(s.rng.choice(s.states)), None),
+    ('search_venues', 'POST', lambda s: '/venues/search', lambda s: {"search_term": s.word()}),
+    ('search_suggest', 'GET', lambda s: '/search/suggest?q={}'.format(s.word()[:3]), None),
+    ('show_venue', 'GET', lambda s: '/venues/{}'.format(s.venue()), None),
+    ('venue_availability', 'GET', lambda s: '/venues/{}/availability'.format(s.venue()), None),
+    ('create_venue_form', 'GET', lambda s: '/venues/create', None),
+    ('create_venue', 'POST', lambda s: '/venues/create', venue_form),
+    ('artists', 'GET', lambda s: '/artists', None),
+    ('search_artists', 'POST', lambda s: '/artists/search', lambda s: {"search_term": s.word()}),
+    ('show_artist', 'GET', lambda s: '/artists/{}'.format(s.artist()), None),
+    ('artist_availability', 'GET', lambda s: '/artists/{}/availability'.format(s.artist()), None),
+    ('edit_artist', 'GET', lambda s: '/artists/{}/edit'.format(s.artist()), None),
+    ('edit_artist_submission', 'POST', lambda s: '/artists/{}/edit'.format(s.artist()), artist_form),
+    ('edit_venue', 'GET', lambda s: '/venues/{}/edit'.format(s.venue()), None),
+    ('edit_venue_submission', 'POST', lambda s: '/venues/{}/edit'.format(s.venue()), venue_form),
+    ('create_artist_form', 'GET', lambda s: '/artists/create', None),
+    ('create_artist', 'POST', lambda s: '/artists/create', artist_form),
+    ('shows', 'GET', lambda s: '/shows', None),
+    ('shows_json', 'GET', lambda s: '/shows.json', None),
+    ('shows_ndjson', 'GET', lambda s: '/shows.ndjson', None),
+    ('create_shows', 'GET', lambda s: '/shows/create', None),
+    ('create_show', 'POST', lambda s: '/shows/create', show_form),
+    ('create_shows_batch', 'POST', lambda s: '/shows/batch', shows_batch),
+    ('genres', 'GET', lambda s: '/genres', None),
+    ('show_genre', 'GET', lambda s: '/genres/{}'.format(s.rng.choice(s.genres)), None),
+    ('export_venues', 'GET', lambda s: '/export/venues.csv', None),
+    ('cache_stats', 'GET', lambda s: '/cache/stats', None),
+    ('metrics', 'GET', lambda s: '/metrics', None),
+    # last: deletes the venues created above
+    ('delete_venue', 'POST', lambda s: '/venues/{}/delete'.format(bench_venue(s)), None),
+]
+
+
+def percentile(values, p):
+    # nearest rank on sorted values
+    return values[min(len(values) - 1, max(0, int(round(p / 100 * len(values))) - 1))]
+
+
+def run(client, sample, method, path, data, count, headers):
+    timings = []
+    started = time.perf_counter()
+    for _ in range(count):
+        url = path(sample)
+        form = data(sample) if data else None
+        t = time.perf_counter()
+        if isinstance(form, JsonBody):
+            response = client.open(url, method=method, json=form, headers=headers)
+        else:
+            response = client.open(url, method=method, data=form, headers=headers)
+        response.get_data()  # drain streamed bodies
+        timings.append((time.perf_counter() - t) * 1000)
+        if response.status_code >= 400:
+            sys.exit('{} {} -> {}'.format(method, url, response.status_code))
+        if isinstance(form, JsonBody):
+            # double bookings are expected (random slots, earlier runs), any
+            # other rejection (a bad rrule expansion) is a bug
+            errors = [result['error'] for result in response.get_json()['results']
+                      if result['status'] == 'rejected' and not any(
+                          word in result['error'] for word in ('overlap', 'booked'))]
+            if errors:
+                sys.exit('{} {} rejected rows: {}'.format(method, url, errors[0]))
+    elapsed = time.perf_counter() - started
+    timings.sort()
+    return {
+        "p50": percentile(timings, 50),
+        "p95": percentile(timings, 95),
+        "p99": percentile(timings, 99),
+        "rps": count / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per route.')
+    parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests per route first.')
+    parser.add_argument('--only', help='Comma-separated route names.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed p95 regression (0.25 = +25%%).')
+    parser.add_argument('--save-baseline', action='store_true', help='Store this run as the baseline.')
+    args = parser.parse_args()
+
+    app = create_app()
+    app.config['EXPORT_API_TOKEN'] = app.config['EXPORT_API_TOKEN'] or 'benchmark'
+    headers = {"Authorization": 'Bearer ' + app.config['EXPORT_API_TOKEN']}
+    only = set(args.only.split(',')) if args.only else None
+    routes = [route for route in ROUTES if only is None or route[0] in only]
+
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        sample = Sample(random.Random(args.seed))
+        sizes = {"venues": len(sample.venue_ids), "artists": len(sample.artist_ids)}
+    baseline_path = os.path.join(BASELINES, 'routes-{}.json'.format(dialect))
+    baseline = {}
+    if os.path.exists(baseline_path) and not args.save_baseline:
+        with open(baseline_path) as f:
+            baseline = json.load(f)['routes']
+
+    client = app.test_client()
+    results, failures = {}, []
+    print('{} ({} venues, {} artists), {} requests per route'.format(dialect, sizes['venues'], sizes['artists'], args.requests))
+    print('  {:<24} {:>9} {:>9} {:>9} {:>9}   {}'.format('route', 'p50 ms', 'p95 ms', 'p99 ms', 'req/s', 'vs baseline p95'))
+    for name, method, path, data in routes:
+        with app.app_context():
+            run(client, sample, method, path, data, args.warmup, headers)
+            result = results[name] = run(client, sample, method, path, data, args.requests, headers)
+        note = ''
+        if name in baseline:
+            allowed = baseline[name]['p95'] * (1 + args.tolerance) + SLACK_MS
+            note = '{:+.0%}'.format(result['p95'] / baseline[name]['p95'] - 1)
+            if result['p95'] > allowed:
+                failures.append(name)
+                note += '  REGRESSION'
+        print('  {:<24} {:9.2f} {:9.2f} {:9.2f} {:9.0f}   {}'.format(
+            name, result['p50'], result['p95'], result['p99'], result['rps'], note))
+
+    if args.save_baseline:
+        os.makedirs(BASELINES, exist_ok=True)
+        with open(baseline_path, 'w') as f:
+            json.dump({"sizes": sizes, "requests": args.requests, "routes": results}, f, indent=2, sort_keys=True)
+        print('baseline written to {}'.format(baseline_path))
+    if failures:
+        sys.exit('p95 regressions: {}'.format(', '.join(failures)))
+
+
+if __name__ == '__main__':
+    main()
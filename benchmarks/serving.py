@@ -0,0 +1,164 @@
+#----------------------------------------------------------------------------#
+# Serving benchmark: development server vs. production profile.
+#
+# Starts the app twice against the database in SQLALCHEMY_DATABASE_URI:
+# `flask run --debug` (development config, reloader and debugger) and
+# gunicorn with gunicorn.conf.py (production config, preforked workers),
+# then fires the same concurrent GET requests at both over HTTP and reports
+# p50 / p95 latency and throughput per route and mode. Read-only: fill the
+# database with `flask seed` first.
+#
+#   python benchmarks/serving.py [--requests 300] [--concurrency 16]
+#   python benchmarks/serving.py --only prod --workers 4 --threads 8
+#----------------------------------------------------------------------------#
+
+import argparse
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import urlopen
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from app import create_app
+from models import db, Venue, Artist
+
+# (name, path): path is a callable of the sampled ids
+ROUTES = [
+    ('index', lambda ids: '/'),
+    ('venues', lambda ids: '/venues'),
+    ('show_venue', lambda ids: '/venues/{}'.format(random.choice(ids['venues']))),
+    ('artists', lambda ids: '/artists'),
+    ('show_artist', lambda ids: '/artists/{}'.format(random.choice(ids['artists']))),
+    ('shows', lambda ids: '/shows'),
+]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def commands(args, port):
+    bind = '127.0.0.1:{}'.format(port)
+    gunicorn = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', bind]
+    # the profile refuses several workers on the per-process memory cache
+    workers = args.workers or (None if os.environ.get('CACHE_BACKEND') == 'redis' else 1)
+    if workers:
+        gunicorn += ['--workers', str(workers)]
+    if args.threads:
+        gunicorn += ['--threads', str(args.threads)]
+    return {
+        'dev': ([sys.executable, '-m', 'flask', '--app', 'app', 'run', '--debug', '--port', str(port)], 'development'),
+        'prod': (gunicorn, 'production'),
+    }
+
+
+def start(command, env_name):
+    env = dict(os.environ, FLASK_ENV=env_name, SECRET_KEY=os.environ.get('SECRET_KEY', 'benchmark'))
+    # own process group: the reloader and the gunicorn workers go down with it
+    return subprocess.Popen(command, cwd=ROOT, env=env, start_new_session=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_ready(process, base, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            sys.exit('server exited with status {}'.format(process.returncode))
+        try:
+            urlopen(base + '/', timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    sys.exit('server not ready after {}s'.format(timeout))
+
+
+def stop(process):
+    os.killpg(process.pid, signal.SIGTERM)
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def fetch(url):
+    t = time.perf_counter()
+    with urlopen(url, timeout=30) as response:
+        response.read()
+        if response.status >= 400:
+            raise RuntimeError('{} -> {}'.format(url, response.status))
+    return (time.perf_counter() - t) * 1000
+
+
+def percentile(values, p):
+    # nearest rank on sorted values
+    return values[min(len(values) - 1, max(0, int(round(p / 100 * len(values))) - 1))]
+
+
+def run(pool, base, path, ids, count):
+    started = time.perf_counter()
+    timings = sorted(pool.map(fetch, [base + path(ids) for _ in range(count)]))
+    return {
+        "p50": percentile(timings, 50),
+        "p95": percentile(timings, 95),
+        "rps": count / (time.perf_counter() - started),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=300, help='Measured requests per route and mode.')
+    parser.add_argument('--warmup', type=int, default=20, help='Unmeasured requests per route first.')
+    parser.add_argument('--concurrency', type=int, default=16, help='Requests in flight.')
+    parser.add_argument('--only', choices=['dev', 'prod'], help='Run a single mode.')
+    parser.add_argument('--workers', type=int, help='Override the gunicorn profile (1 unless CACHE_BACKEND=redis).')
+    parser.add_argument('--threads', type=int, help='Override the gunicorn profile.')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    app = create_app('test')
+    with app.app_context():
+        ids = {"venues": [id for (id,) in db.session.query(Venue.id)],
+               "artists": [id for (id,) in db.session.query(Artist.id)]}
+    if not (ids['venues'] and ids['artists']):
+        sys.exit('the database is empty: run `flask seed` first')
+
+    port = free_port()
+    results = {}
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        for mode, (command, env_name) in commands(args, port).items():
+            if args.only and mode != args.only:
+                continue
+            process = start(command, env_name)
+            base = 'http://127.0.0.1:{}'.format(port)
+            try:
+                wait_ready(process, base)
+                for name, path in ROUTES:
+                    run(pool, base, path, ids, args.warmup)
+                    results[mode, name] = run(pool, base, path, ids, args.requests)
+            finally:
+                stop(process)
+
+    modes = [mode for mode in ('dev', 'prod') if (mode, ROUTES[0][0]) in results]
+    print('{} requests per route, {} in flight'.format(args.requests, args.concurrency))
+    print('  {:<14} {:<5} {:>9} {:>9} {:>9}'.format('route', 'mode', 'p50 ms', 'p95 ms', 'req/s'))
+    for name, _ in ROUTES:
+        for mode in modes:
+            result = results[mode, name]
+            note = ''
+            if mode == 'prod' and ('dev', name) in results:
+                note = '  x{:.1f}'.format(result['rps'] / results['dev', name]['rps'])
+            print('  {:<14} {:<5} {:9.2f} {:9.2f} {:9.0f}{}'.format(
+                name, mode, result['p50'], result['p95'], result['rps'], note))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+import asyncio
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+import click
+
+try:
+    import redis
+except ImportError:  # optional, only needed for CACHE_BACKEND = 'redis'
+    redis = None
+
+#----------------------------------------------------------------------------#
+# Cache for read-heavy page data with entity-versioned keys.
+#
+# Every cached value is stored under a key that embeds the current version
+# of each entity it depends on ('venues', 'venue:3', ...). Writes bump the
+# versions they affect, so stale entries are never read again and simply
+# age out of the backend. Versions start from a timestamp rather than 0, so
+# a version lost from the backend can never collide with an older one.
+#----------------------------------------------------------------------------#
+
+
+class LRUCache:
+    # in-process backend: bounded LRU with per-entry TTL
+    def __init__(self, max_entries=10000, default_ttl=300):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.hits = self.misses = self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # versions are kept apart so LRU pressure never evicts them
+        self._versions = {}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (ttl or self.default_ttl)
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def versions(self, names):
+        with self._lock:
+            return [self._versions.setdefault(name, time.time_ns()) for name in names]
+
+    def bump(self, names):
+        with self._lock:
+            for name in names:
+                self._versions[name] = self._versions.get(name, time.time_ns()) + 1
+
+    def stats(self):
+        return {
+            "backend": "memory",
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+        }
+
+
+class RedisCache:
+    # shared backend for multi-process deployments; configure Redis with a
+    # volatile-* eviction policy so only the TTL'd data keys are evicted
+    def __init__(self, client, default_ttl=300, prefix='fyyur:'):
+        self.client = client
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pickle.loads(value)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl or self.default_ttl)
+
+    def versions(self, names):
+        keys = [self.prefix + 'v:' + name for name in names]
+        pipe = self.client.pipeline()
+        for key in keys:
+            pipe.set(key, time.time_ns(), nx=True)
+        pipe.mget(keys)
+        return [int(version) for version in pipe.execute()[-1]]
+
+    def bump(self, names):
+        pipe = self.client.pipeline()
+        for name in names:
+            key = self.prefix + 'v:' + name
+            pipe.set(key, time.time_ns(), nx=True)
+            pipe.incr(key)
+        pipe.execute()
+
+    def stats(self):
+        return {
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.client.info('stats').get('evicted_keys', 0),
+        }
+
+
+class Cache:
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        ttl = app.config['CACHE_DEFAULT_TTL']
+        if app.config['CACHE_BACKEND'] == 'redis':
+            if redis is None:
+                raise RuntimeError("CACHE_BACKEND = 'redis' requires the redis package")
+            self.backend = RedisCache(redis.Redis.from_url(app.config['CACHE_REDIS_URL']), ttl)
+        else:
+            self.backend = LRUCache(app.config['CACHE_MAX_ENTRIES'], ttl)
+
+    def _versioned(self, key, depends_on):
+        # depends_on names the entity versions the value is derived from
+        versions = self.backend.versions(depends_on)
+        return '{}|{}'.format(key, '|'.join('{}={}'.format(name, version) for name, version in zip(depends_on, versions)))
+
+    def get_or_set(self, key, depends_on, build, ttl=None):
+        key = self._versioned(key, depends_on)
+        value = self.backend.get(key)
+        if value is None:
+            value = build()
+            self.backend.set(key, value, ttl)
+        return value
+
+    async def _off_loop(self, function, *args):
+        # the Redis client blocks for a round trip: run it in a thread; the
+        # memory backend only takes a lock
+        if isinstance(self.backend, RedisCache):
+            return await asyncio.to_thread(function, *args)
+        return function(*args)
+
+    async def get_or_set_async(self, key, depends_on, build, ttl=None):
+        # for the asgi.py views: build returns an awaitable, and the keys are
+        # the ones the sync views use, so both stacks share entries
+        key = await self._off_loop(self._versioned, key, depends_on)
+        value = await self._off_loop(self.backend.get, key)
+        if value is None:
+            value = await build()
+            await self._off_loop(self.backend.set, key, value, ttl)
+        return value
+
+    def versions(self, names):
+        return self.backend.versions(names)
+
+    def bump(self, *names):
+        self.backend.bump(names)
+
+    def warn_if_local(self):
+        # for CLI commands: they run in their own process, so with the memory
+        # backend their bumps reach no web worker. Page data is keyed by the
+        # DB validators (conditional.cache_key) and refreshes regardless;
+        # per-worker versions and {% cache %} fragments wait for their TTL
+        if not isinstance(self.backend, RedisCache):
+            click.echo("CACHE_BACKEND is 'memory': web workers are not notified of these changes; "
+                       "cached fragments expire after FRAGMENT_CACHE_TTL. Use CACHE_BACKEND=redis "
+                       "to invalidate them immediately.", err=True)
+
+    def stats(self):
+        return self.backend.stats()
+
+
+cache = Cache()
@@ -0,0 +1,99 @@
+import hashlib
+import os
+from datetime import timezone
+
+from flask import current_app, make_response, request, session
+
+import filters
+
+#----------------------------------------------------------------------------#
+# Conditional GET (ETag / Last-Modified).
+#
+# Views compute a cheap validator (max updated_at, row counts, ...) with one
+# aggregate query and hand the expensive part, loading and rendering, to
+# respond() as a callable, which is only called when the client's copy is
+# stale.
+#----------------------------------------------------------------------------#
+
+_template_salt = None
+
+
+def _salt():
+    # rendered HTML also depends on the templates: fold their mtimes into
+    # every ETag so a deploy that changes a template invalidates client copies
+    global _template_salt
+    if _template_salt is None:
+        digest = hashlib.sha1(current_app.config.get('ETAG_SALT', '').encode())
+        for root, _, files in sorted(os.walk(os.path.join(current_app.root_path, current_app.template_folder))):
+            for name in sorted(files):
+                stat = os.stat(os.path.join(root, name))
+                digest.update('{}:{}:{}'.format(name, stat.st_mtime_ns, stat.st_size).encode())
+        _template_salt = digest.hexdigest()
+    return _template_salt
+
+
+def _as_utc(value):
+    # naive timestamps (SQLite) are stored as UTC
+    if value is not None and value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def last_modified(*values):
+    values = [_as_utc(value) for value in values if value is not None]
+    return max(values) if values else None
+
+
+def cache_key(key, parts):
+    # page data cached under the validator it is served with: an ETag can
+    # only ever be attached to data read in the same validator state, and
+    # changes no write path bumps (a show moving into the past, counters
+    # refreshed by another process) still reach the cache
+    return '{}@{}'.format(key, hashlib.sha1(repr(parts).encode()).hexdigest()[:16])
+
+
+def _validate(parts, modified, use_modified_since):
+    # dates render in the request's locale and timezone
+    variant = (filters.request_locale(), filters.request_timezone())
+    etag = hashlib.sha1(repr((_salt(), request.full_path, variant, parts)).encode()).hexdigest()
+    if modified is not None:
+        modified = modified.replace(microsecond=0)
+
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    else:
+        not_modified = (use_modified_since and modified is not None
+                        and request.if_modified_since is not None
+                        and modified <= request.if_modified_since)
+    return etag, modified, not_modified
+
+
+def _finish(response, etag, modified):
+    response.set_etag(etag)
+    if modified is not None:
+        response.last_modified = modified
+    # let browsers and the CDN keep the copy, but revalidate on every use
+    response.cache_control.no_cache = True
+    response.vary.update(('Accept-Language', 'Cookie'))
+    return response
+
+
+def respond(render, parts, modified=None, use_modified_since=True):
+    # parts: anything that changes whenever the page would render differently.
+    # use_modified_since=False for pages whose content can change without
+    # any updated_at moving forward (deletions from a list).
+    if session.get('_flashes'):
+        # a pending flash message makes this copy unique: never validate it
+        return render()
+    etag, modified, not_modified = _validate(parts, modified, use_modified_since)
+    response = current_app.response_class(status=304) if not_modified else make_response(render())
+    return _finish(response, etag, modified)
+
+
+async def respond_async(render, parts, modified=None, use_modified_since=True):
+    # same as respond() for the asgi.py views, where render is a coroutine function
+    if session.get('_flashes'):
+        return await render()
+    etag, modified, not_modified = _validate(parts, modified, use_modified_since)
+    response = current_app.response_class(status=304) if not_modified else make_response(await render())
+    return _finish(response, etag, modified)
@@ -7,10 +7,11 @@ SECRET_KEY = os.getenv('SECRET_KEY')
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable the development mode.
+# Environment: development (default), test or production, see the classes
+# at the end of this file
 FLASK_ENV = os.getenv('FLASK_ENV')
-# Enable debug mode.
-DEBUG = True
+# Debug mode (reloader, debugger, template auto-reload) is set per environment
+DEBUG = False
 
 # secret key for CSRF token
 WTF_CSRF_SECRET_KEY = os.getenv('WTF_CSRF_SECRET_KEY')
@@ -20,3 +21,117 @@ WTF_CSRF_ENABLED = False
 # Connect to the database and DATABASE URL
 SQLALCHEMY_DATABASE_URI = os.getenv('SQLALCHEMY_DATABASE_URI')
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool. pre-ping checks connections before use (survives database
+# restarts and idle timeouts); recycle closes connections older than that many
+# seconds. Size / overflow / timeout only apply to pooled (non-SQLite) URIs.
+SQLALCHEMY_ENGINE_OPTIONS = {
+    'pool_pre_ping': os.getenv('SQLALCHEMY_POOL_PRE_PING', '1') == '1',
+    'pool_recycle': int(os.getenv('SQLALCHEMY_POOL_RECYCLE', 1800)),
+}
+if not (SQLALCHEMY_DATABASE_URI or '').startswith('sqlite'):
+    SQLALCHEMY_ENGINE_OPTIONS.update(
+        pool_size=int(os.getenv('SQLALCHEMY_POOL_SIZE', 10)),
+        max_overflow=int(os.getenv('SQLALCHEMY_MAX_OVERFLOW', 20)),
+        pool_timeout=int(os.getenv('SQLALCHEMY_POOL_TIMEOUT', 30)),
+    )
+
+# Read replicas (comma-separated URIs): GET requests read from one of them,
+# writes and CLI commands use SQLALCHEMY_DATABASE_URI
+SQLALCHEMY_REPLICA_URIS = [uri for uri in os.getenv('SQLALCHEMY_REPLICA_URIS', '').split(',') if uri]
+# Seconds a client keeps reading from the primary after a write (read-your-writes)
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+# Longest a write can take to become visible to readers, in seconds (open
+# transaction plus replica lag): readers of the rows changed since a given
+# time (typeahead index, incremental exports) look back that much further
+COMMIT_LAG_SECONDS = int(os.getenv('COMMIT_LAG_SECONDS', 300))
+
+# Number of venues listed per page on /venues
+VENUES_PER_PAGE = int(os.getenv('VENUES_PER_PAGE', 100))
+
+# /shows keyset pagination: default and maximum page size
+SHOWS_PER_PAGE = int(os.getenv('SHOWS_PER_PAGE', 60))
+SHOWS_MAX_PER_PAGE = int(os.getenv('SHOWS_MAX_PER_PAGE', 500))
+# Rows fetched per round trip when streaming /shows.ndjson
+SHOWS_STREAM_BATCH_SIZE = int(os.getenv('SHOWS_STREAM_BATCH_SIZE', 1000))
+
+# Length of a show when no end time is given, in minutes
+SHOW_DEFAULT_MINUTES = int(os.getenv('SHOW_DEFAULT_MINUTES', 120))
+# /venues/<id>/availability and /artists/<id>/availability: default and
+# maximum length of the ?from=&to= window, in days
+AVAILABILITY_DEFAULT_DAYS = int(os.getenv('AVAILABILITY_DEFAULT_DAYS', 30))
+AVAILABILITY_MAX_DAYS = int(os.getenv('AVAILABILITY_MAX_DAYS', 366))
+# Most shows one POST /shows/batch or `flask shows` call may create,
+# recurrences expanded
+SHOW_BATCH_MAX = int(os.getenv('SHOW_BATCH_MAX', 500))
+
+# Results per page on /venues/search and /artists/search
+SEARCH_RESULTS_PER_PAGE = int(os.getenv('SEARCH_RESULTS_PER_PAGE', 20))
+
+# Venues and artists per page on /genres/<genre>
+GENRE_RESULTS_PER_PAGE = int(os.getenv('GENRE_RESULTS_PER_PAGE', 50))
+
+# /search/suggest: default and maximum number of suggestions returned
+SUGGEST_TOP_K = int(os.getenv('SUGGEST_TOP_K', 8))
+SUGGEST_MAX_K = int(os.getenv('SUGGEST_MAX_K', 20))
+# how often a worker reads the venue / artist names other processes changed
+SUGGEST_REFRESH_SECONDS = int(os.getenv('SUGGEST_REFRESH_SECONDS', 30))
+
+# Page data cache: 'memory' (per-process LRU) or 'redis' (shared, needs the redis package)
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+CACHE_DEFAULT_TTL = int(os.getenv('CACHE_DEFAULT_TTL', 300))
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 10000))
+
+# Compiled templates, reused across worker starts; empty to disable
+JINJA_BYTECODE_CACHE_DIR = os.getenv('JINJA_BYTECODE_CACHE_DIR', os.path.join(basedir, '.jinja_cache'))
+# {% cache %} fragments kept per process (0 disables) and their TTL in seconds
+FRAGMENT_CACHE_MAX_ENTRIES = int(os.getenv('FRAGMENT_CACHE_MAX_ENTRIES', 20000))
+FRAGMENT_CACHE_TTL = int(os.getenv('FRAGMENT_CACHE_TTL', 3600))
+
+# Cache lifetime of the fingerprinted bundles under static/dist/ (a year)
+STATIC_IMMUTABLE_MAX_AGE = int(os.getenv('STATIC_IMMUTABLE_MAX_AGE', 31536000))
+
+# Date formatting: locales offered to Accept-Language and the defaults used
+# when the request does not pick one (timezone comes from the `tz` cookie)
+LOCALES = os.getenv('LOCALES', 'en').split(',')
+BABEL_DEFAULT_LOCALE = os.getenv('BABEL_DEFAULT_LOCALE', 'en')
+BABEL_DEFAULT_TIMEZONE = os.getenv('BABEL_DEFAULT_TIMEZONE', 'UTC')
+
+# /export/* endpoints: bearer token required (exports are disabled when unset)
+EXPORT_API_TOKEN = os.getenv('EXPORT_API_TOKEN')
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+
+# Request instrumentation: a statement run this many times in one request is
+# logged as a likely N+1; the X-SQL-Stats debug header is off by default
+N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', 5))
+METRICS_DEBUG_HEADER = os.getenv('METRICS_DEBUG_HEADER', '0') == '1'
+
+#----------------------------------------------------------------------------#
+# Environments.
+#
+# create_app() loads the settings above, then the overrides of the class
+# picked by FLASK_ENV (create_app(env) or wsgi.py may pick one instead).
+#----------------------------------------------------------------------------#
+
+class DevelopmentConfig:
+    DEBUG = True
+    TEMPLATES_AUTO_RELOAD = True
+
+
+class TestConfig:
+    TESTING = True
+    DEBUG = False
+
+
+class ProductionConfig:
+    # no reloader, debugger or template mtime checks
+    DEBUG = False
+    TEMPLATES_AUTO_RELOAD = False
+
+
+environments = {
+    'development': DevelopmentConfig,
+    'test': TestConfig,
+    'production': ProductionConfig,
+}
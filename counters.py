@@ -0,0 +1,115 @@
+from datetime import datetime, timedelta, timezone
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, select, update
+from cache import cache
+from models import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Denormalized upcoming / past show counters on venues and artists.
+#
+# Writes adjust the counters in the same transaction as the show change, and
+# `flask counters reconcile` (run from cron) moves shows whose start_time has
+# passed since the previous run from upcoming to past. Counter updates set
+# updated_at to itself so its onupdate does not fire: it drives the ETag /
+# Last-Modified validators and incremental exports, and the pages that
+# render show counts see the shows themselves.
+#----------------------------------------------------------------------------#
+
+SHOW_KEYS = {Venue: Show.venue_id, Artist: Show.artist_id}
+
+
+def _count(model, condition):
+    return select(func.count(Show.id)) \
+        .where(SHOW_KEYS[model] == model.id, condition) \
+        .scalar_subquery()
+
+
+def show_added(venue_id, artist_id, upcoming):
+    # O(1) increment for a single new show
+    column = 'upcoming_shows_count' if upcoming else 'past_shows_count'
+    for model, id in ((Venue, venue_id), (Artist, artist_id)):
+        counter = getattr(model, column)
+        db.session.execute(update(model).where(model.id == id)
+                           .values({counter: counter + 1, model.updated_at: model.updated_at}))
+
+
+def refresh(model, ids=None, now=None):
+    # recompute the counters of the given rows (all rows when ids is None)
+    # from the shows table; idempotent, so it is safe to overlap runs
+    now = now or datetime.now(timezone.utc)
+    statement = update(model).values(
+        upcoming_shows_count=_count(model, Show.start_time >= now),
+        past_shows_count=_count(model, Show.start_time < now),
+        updated_at=model.updated_at,
+    )
+    if ids is not None:
+        ids = list(ids)
+        if not ids:
+            return
+        statement = statement.where(model.id.in_(ids))
+    db.session.execute(statement.execution_options(synchronize_session=False))
+
+
+def reconcile(window, now=None):
+    # refresh only the venues / artists with a show that started within the
+    # last `window`; run at least once per window
+    now = now or datetime.now(timezone.utc)
+    for model, key in SHOW_KEYS.items():
+        ids = select(key).where(Show.start_time >= now - window, Show.start_time < now).distinct()
+        refresh(model, [id for (id,) in db.session.execute(ids)], now)
+
+
+def mismatches(model, now=None):
+    now = now or datetime.now(timezone.utc)
+    upcoming = _count(model, Show.start_time >= now)
+    past = _count(model, Show.start_time < now)
+    query = db.session.query(model.id, model.upcoming_shows_count, upcoming, model.past_shows_count, past) \
+        .filter((model.upcoming_shows_count != upcoming) | (model.past_shows_count != past)) \
+        .order_by(model.id)
+    return query.all()
+
+#----------------------------------------------------------------------------#
+# CLI.
+#----------------------------------------------------------------------------#
+
+cli = AppGroup('counters', help='Maintain the denormalized show counters.')
+
+
+@cli.command('rebuild')
+def rebuild_command():
+    """Recompute every venue and artist counter from the shows table."""
+    now = datetime.now(timezone.utc)
+    for model in SHOW_KEYS:
+        refresh(model, now=now)
+    db.session.commit()
+    cache.bump('venues')
+    cache.warn_if_local()
+    click.echo('Counters rebuilt.')
+
+
+@cli.command('reconcile')
+@click.option('--window', default=60, show_default=True,
+              help='Minutes to look back; schedule the job at least this often.')
+def reconcile_command(window):
+    """Move shows that started recently from upcoming to past."""
+    reconcile(timedelta(minutes=window))
+    db.session.commit()
+    cache.bump('venues')
+    cache.warn_if_local()
+    click.echo('Counters reconciled.')
+
+
+@cli.command('verify')
+def verify_command():
+    """Compare stored counters with the shows table; exits 1 on drift."""
+    drift = False
+    for model in SHOW_KEYS:
+        for id, upcoming, expected_upcoming, past, expected_past in mismatches(model):
+            drift = True
+            click.echo('{} {}: upcoming {} (expected {}), past {} (expected {})'.format(
+                model.__tablename__, id, upcoming, expected_upcoming, past, expected_past))
+    if drift:
+        raise SystemExit(1)
+    click.echo('Counters are consistent.')
@@ -0,0 +1,25 @@
+from sqlalchemy import event
+
+from models import db, Deletion, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Deletion tombstones.
+#
+# A deleted row moves no updated_at, so every venue, artist and show deleted
+# through the session (relationship cascades included) leaves a Deletion row
+# in the same transaction. The list validators count them per table and
+# suggest.py replays them into its index. Raw SQL deletes are not recorded.
+#----------------------------------------------------------------------------#
+
+TABLES = {model: model.__tablename__ for model in (Venue, Artist, Show)}
+
+
+def _record_deletions(session, flush_context, instances):
+    for obj in list(session.deleted):
+        table_name = TABLES.get(type(obj))
+        if table_name:
+            session.add(Deletion(table_name=table_name, entity_id=obj.id))
+
+
+def init_app(app):
+    event.listen(db.session, 'before_flush', _record_deletions)
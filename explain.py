@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta, timezone
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, tuple_
+
+import availability
+from models import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Index usage check for the hot queries.
+#
+# Each query below has the shape of one the views or jobs run on every
+# request; `flask indexes check` EXPLAINs them and fails unless the plan uses
+# the expected index. On PostgreSQL sequential scans are disabled for the
+# check, so it answers "can the planner use the index" even on a small dev
+# database where a seq scan would be cheaper.
+#----------------------------------------------------------------------------#
+
+
+def hot_queries():
+    # (description, expected index, query)
+    now = datetime.now(timezone.utc)
+    return [
+        ('venue page shows', 'ix_shows_venue_id_start_time',
+         db.session.query(Show.id).filter(Show.venue_id == 1, Show.start_time >= now)),
+        ('artist page shows', 'ix_shows_artist_id_start_time',
+         db.session.query(Show.id).filter(Show.artist_id == 1, Show.start_time < now)),
+        ('/shows keyset page', 'ix_shows_start_time_id',
+         db.session.query(Show.id, Show.start_time)
+         .filter(tuple_(Show.start_time, Show.id) > (now, 0))
+         .order_by(Show.start_time, Show.id).limit(60)),
+        ('double-booking check', 'ix_shows_venue_id_start_time',
+         availability.overlapping(Venue, 1, now, now + timedelta(hours=2))),
+        ('counters reconcile window', 'ix_shows_start_time_id',
+         db.session.query(Show.venue_id).filter(Show.start_time >= now, Show.start_time < now).distinct()),
+        ('/venues state drill-down', 'ix_venues_state_city_id',
+         db.session.query(Venue.id, Venue.name, Venue.city).filter(Venue.state == 'CA')
+         .order_by(Venue.state, Venue.city, Venue.id).limit(101)),
+        ('/artists listing', 'ix_artists_lower_name',
+         db.session.query(Artist.id, Artist.name).order_by(func.lower(Artist.name))),
+        ('venue name lookup', 'ix_venues_lower_name',
+         db.session.query(Venue.id).filter(func.lower(Venue.name) == 'the musical hop')),
+    ]
+
+
+def explain(query):
+    # plan text of a query, bound parameters included
+    compiled = query.statement.compile(db.engine)
+    params = compiled.params
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    prefix = 'EXPLAIN QUERY PLAN ' if db.engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    rows = db.session.connection().exec_driver_sql(prefix + str(compiled), params)
+    return '\n'.join(str(row[-1]) for row in rows)
+
+
+def check():
+    # yields (description, expected index, plan, ok)
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute('SET LOCAL enable_seqscan = off')
+    try:
+        for description, index, query in hot_queries():
+            plan = explain(query)
+            yield description, index, plan, index in plan
+    finally:
+        db.session.rollback()
+
+#----------------------------------------------------------------------------#
+# CLI.
+#----------------------------------------------------------------------------#
+
+cli = AppGroup('indexes', help='Check that the hot queries use their indexes.')
+
+
+@cli.command('check')
+@click.option('-v', '--verbose', is_flag=True, help='Print every plan, not only the failing ones.')
+def check_command(verbose):
+    """EXPLAIN the hot queries; exits non-zero if one misses its index."""
+    failed = 0
+    for description, index, plan, ok in check():
+        click.echo('{} {}: {}'.format('ok  ' if ok else 'FAIL', description, index))
+        if verbose or not ok:
+            click.echo('    ' + plan.replace('\n', '\n    '))
+        failed += not ok
+    if failed:
+        raise click.ClickException('{} queries do not use their index'.format(failed))
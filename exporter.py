@@ -0,0 +1,120 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timedelta, timezone
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from models import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Streaming export of the catalog as CSV or NDJSON.
+#
+# Rows come from a server-side cursor (yield_per) and are encoded into
+# ~64KB chunks, optionally gzipped on the fly, so memory stays constant
+# whatever the table size. `since` restricts the export to rows changed
+# after a timestamp (deletions are not exported); the watermark handed out
+# for the next run is COMMIT_LAG_SECONDS in the past, so rows written near
+# the end of a run can come again in the next one: load exports by id.
+#----------------------------------------------------------------------------#
+
+TABLES = {'venues': Venue, 'artists': Artist, 'shows': Show}
+FORMATS = ('csv', 'ndjson')
+CHUNK_SIZE = 64 * 1024
+
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def rows(model, since=None, batch_size=1000):
+    columns = model.__table__.columns
+    query = db.session.query(*columns).order_by(model.id)
+    if since is not None:
+        query = query.filter(model.updated_at > since)
+    for row in query.yield_per(batch_size):
+        yield [_value(value) for value in row]
+
+
+def encode(model, rows, format):
+    # yields text chunks of roughly CHUNK_SIZE
+    names = [column.name for column in model.__table__.columns]
+    buffer = io.StringIO()
+    if format == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(names)
+        write = writer.writerow
+    else:
+        def write(row):
+            buffer.write(json.dumps(dict(zip(names, row))))
+            buffer.write('\n')
+    for row in rows:
+        write(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export(table, format, since=None, gzip=False, batch_size=1000):
+    # bytes chunks for the whole export
+    model = TABLES[table]
+    chunks = encode(model, rows(model, since, batch_size), format)
+    if gzip:
+        return gzipped(chunks)
+    return (chunk.encode('utf-8') for chunk in chunks)
+
+
+def watermark():
+    # `since` for the next incremental run. A row stamped before now but
+    # committed after this export read it is older than the watermark:
+    # look back the longest a write takes to become visible
+    return datetime.now(timezone.utc) - timedelta(seconds=current_app.config['COMMIT_LAG_SECONDS'])
+
+
+def parse_since(value):
+    if not value:
+        return None
+    since = datetime.fromisoformat(value)
+    return since if since.tzinfo else since.replace(tzinfo=timezone.utc)
+
+#----------------------------------------------------------------------------#
+# CLI.
+#----------------------------------------------------------------------------#
+
+cli = AppGroup('export', help='Stream venues, artists or shows as CSV or NDJSON.')
+
+
+def _export_command(table):
+    @click.option('--format', 'format', type=click.Choice(FORMATS), default='ndjson', show_default=True)
+    @click.option('--since', help='Only rows changed after this ISO timestamp (incremental export).')
+    @click.option('--gzip', 'gzip', is_flag=True, help='Compress the output.')
+    @click.option('--batch-size', default=1000, show_default=True, help='Rows fetched per round trip.')
+    @click.option('-o', '--output', type=click.File('wb'), default='-', help='Output file, stdout by default.')
+    def command(format, since, gzip, batch_size, output):
+        next_since = watermark()
+        for chunk in export(table, format, parse_since(since), gzip, batch_size):
+            output.write(chunk)
+        # pass this back as --since on the next incremental run
+        click.echo('watermark: {}'.format(next_since.isoformat()), err=True)
+
+    command.__doc__ = 'Export {}.'.format(table)
+    return cli.command(table)(command)
+
+
+for _table in TABLES:
+    _export_command(_table)
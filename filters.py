@@ -0,0 +1,77 @@
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from flask import current_app, g, has_request_context, request
+
+#----------------------------------------------------------------------------#
+# Jinja `datetime` filter.
+#
+# Views pass real datetime objects; Babel patterns and locales are compiled
+# once, and formatted values are memoized per (value, format, locale, tz),
+# so a page full of shows costs a few dict lookups instead of a parse and a
+# pattern compilation per row.
+#----------------------------------------------------------------------------#
+
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=64)
+def compile_format(format):
+    # Babel (and pytz below) are imported on the first date formatted
+    from babel.dates import parse_pattern
+    return parse_pattern(FORMATS.get(format, format))
+
+
+@lru_cache(maxsize=64)
+def get_locale(identifier):
+    from babel import Locale
+    return Locale.parse(identifier)
+
+
+@lru_cache(maxsize=64)
+def get_timezone(name):
+    import pytz
+    return pytz.timezone(name)
+
+
+@lru_cache(maxsize=4096)
+def format_datetime_cached(value, format, locale, tz):
+    # naive timestamps (SQLite) are stored as UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return compile_format(format).apply(value.astimezone(get_timezone(tz)), get_locale(locale))
+
+
+def request_locale():
+    # best match of Accept-Language among LOCALES, resolved once per request
+    if not has_request_context():
+        return current_app.config['BABEL_DEFAULT_LOCALE']
+    if 'locale' not in g:
+        g.locale = request.accept_languages.best_match(
+            current_app.config['LOCALES'], current_app.config['BABEL_DEFAULT_LOCALE'])
+    return g.locale
+
+
+def request_timezone():
+    # the `tz` cookie (an Olson name set by the browser), falling back to
+    # BABEL_DEFAULT_TIMEZONE; resolved once per request
+    default = current_app.config['BABEL_DEFAULT_TIMEZONE']
+    if not has_request_context():
+        return default
+    if 'timezone' not in g:
+        name = request.cookies.get('tz', default)
+        try:
+            get_timezone(name)
+        except KeyError:  # pytz.UnknownTimeZoneError
+            name = default
+        g.timezone = name
+    return g.timezone
+
+
+def format_datetime(value, format='medium'):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return format_datetime_cached(value, format, request_locale(), request_timezone())
@@ -0,0 +1,99 @@
+from sqlalchemy import func, literal, select, union_all
+
+from models import db, Genre, Venue, Artist, venue_genres, artist_genres
+
+#----------------------------------------------------------------------------#
+# Normalized genres.
+#
+# Venues and artists link to the genres lookup table through venue_genres /
+# artist_genres; browsing a genre and counting facets are grouped queries
+# over those association tables. The comma-joined `genres` column stays as a
+# denormalized copy for the full-text search indexes and is only written here.
+#----------------------------------------------------------------------------#
+
+ASSOCIATIONS = {
+    Venue: (venue_genres, venue_genres.c.venue_id),
+    Artist: (artist_genres, artist_genres.c.artist_id),
+}
+
+
+def lookup(names):
+    # Genre rows for the given names, created on first use (added to the
+    # session, so the caller's commit saves them)
+    genres = {genre.name: genre for genre in Genre.query.filter(Genre.name.in_(names))}
+    for name in names:
+        if name not in genres:
+            genres[name] = Genre(name=name)
+            db.session.add(genres[name])
+    return [genres[name] for name in names]
+
+
+def assign(entity, names):
+    entity.genres = lookup(names)
+    entity.genres_text = ','.join(names)
+
+
+def sync(model, condition):
+    # rebuild the associations of the matching rows from their genres column,
+    # for rows inserted in bulk (importer) without going through assign()
+    association, key = ASSOCIATIONS[model]
+    text = literal(',') + model.genres_text + ','
+    db.session.execute(association.delete().where(key.in_(select(model.id).where(condition))))
+    db.session.execute(association.insert().from_select(
+        [key, association.c.genre_id],
+        select(model.id, Genre.id).where(condition, text.like('%,' + Genre.name + ',%')),
+    ))
+
+
+def _tagged(model, columns=(), condition=None):
+    # association rows of one side, tagged with its kind
+    association, key = ASSOCIATIONS[model]
+    query = select(literal(model.__tablename__).label('kind'), association.c.genre_id, *columns) \
+        .select_from(association)
+    if columns:
+        query = query.join(model, model.id == key)
+    if condition is not None:
+        query = query.where(condition)
+    return query
+
+
+def genre_counts():
+    # [(genre, venues, artists)] for every genre, one grouped query
+    tagged = union_all(_tagged(Venue), _tagged(Artist)).subquery()
+    rows = db.session.query(Genre.name, tagged.c.kind, func.count(tagged.c.genre_id)) \
+        .outerjoin(tagged, tagged.c.genre_id == Genre.id) \
+        .group_by(Genre.name, tagged.c.kind) \
+        .order_by(Genre.name)
+    counts = {}
+    for name, kind, count in rows:
+        counts.setdefault(name, {'venues': 0, 'artists': 0})
+        if kind:
+            counts[name][kind] = count
+    return [(name, count['venues'], count['artists']) for name, count in counts.items()]
+
+
+def state_counts(genre):
+    # {state: {'venues': n, 'artists': n}} within one genre, one grouped query
+    tagged = union_all(
+        _tagged(Venue, [Venue.state.label('state')], venue_genres.c.genre_id == genre.id),
+        _tagged(Artist, [Artist.state.label('state')], artist_genres.c.genre_id == genre.id),
+    ).subquery()
+    counts = {}
+    for state, kind, count in db.session.query(tagged.c.state, tagged.c.kind, func.count()) \
+            .group_by(tagged.c.state, tagged.c.kind):
+        counts.setdefault(state, {'venues': 0, 'artists': 0})[kind] = count
+    return dict(sorted(counts.items()))
+
+
+def browse(model, genre, state, page, per_page):
+    # one page of the venues or artists in a genre, optionally in one state;
+    # fetches one extra row to know whether there is a next page
+    association, key = ASSOCIATIONS[model]
+    query = db.session.query(model.id, model.name, model.city, model.state) \
+        .join(association, key == model.id) \
+        .filter(association.c.genre_id == genre.id)
+    if state:
+        query = query.filter(model.state == state)
+    rows = query.order_by(func.lower(model.name), model.id) \
+        .offset((page - 1) * per_page).limit(per_page + 1).all()
+    return [row._asdict() for row in rows[:per_page]], len(rows) > per_page
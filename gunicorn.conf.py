@@ -0,0 +1,65 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+#----------------------------------------------------------------------------#
+# Gunicorn production profile.
+#
+#   gunicorn -c gunicorn.conf.py
+#
+# The app is imported once in the master (preload_app) and the workers are
+# forked from it, sharing the imported code and compiled templates. The
+# master's database pools are emptied before each fork so no worker inherits
+# an open connection (routing.py also refuses connections opened by another
+# process). Every setting can be overridden from the environment or the
+# command line.
+#
+# Caches are per process unless they share a backend: with more than one
+# worker the profile refuses to start on CACHE_BACKEND=memory, since an
+# edit would only invalidate the worker that handled it. Prometheus
+# metrics are written to PROMETHEUS_MULTIPROC_DIR by every worker and
+# summed by /metrics.
+#----------------------------------------------------------------------------#
+
+# read by prometheus_client when the app is preloaded, so set up here;
+# emptied first, or the samples of a previous run would add to this one's
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'fyyur-prometheus'))
+shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'])
+
+wsgi_app = 'wsgi:app'
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:{}'.format(os.getenv('PORT', '8000')))
+
+# processes for CPU-bound rendering, threads to overlap database waits
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+preload_app = True
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = 30
+keepalive = 5
+# recycle workers now and then, staggered so they don't all restart at once
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None
+errorlog = '-'
+
+
+def on_starting(server):
+    app = server.app.wsgi()
+    if server.cfg.workers > 1 and app.config['CACHE_BACKEND'] != 'redis':
+        raise SystemExit("{} workers need CACHE_BACKEND=redis: with the per-process 'memory' backend "
+                         "an edit only invalidates the worker that handled it".format(server.cfg.workers))
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def pre_fork(server, worker):
+    import routing
+    routing.dispose_engines(server.app.wsgi())
@@ -0,0 +1,351 @@
+import csv
+import io
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func
+from sqlalchemy.exc import DBAPIError
+
+import availability
+from cache import cache
+import counters
+import genres
+from choices import STATE_CHOICES, GENRE_CHOICES
+from models import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Bulk import of venues, artists and shows from CSV or JSONL.
+#
+# Rows are streamed from the input, checked with the same rules as
+# VenueForm / ArtistForm / ShowForm (re-implemented without WTForms, which is
+# far too slow per row) and inserted in batches: COPY on PostgreSQL,
+# executemany elsewhere. Invalid rows go to a JSONL reject file.
+#----------------------------------------------------------------------------#
+
+STATES = {value for value, _ in STATE_CHOICES}
+GENRES = {value for value, _ in GENRE_CHOICES}
+TRUE = {'1', 'true', 't', 'yes', 'y', 'on'}
+
+# same shape as wtforms.validators.URL
+URL = re.compile(r'^[a-z]+://(?P<host>[^/?:]+)(?P<port>:[0-9]+)?(?P<path>/.*?)?(?P<query>\?.*)?$', re.IGNORECASE)
+
+
+class RowError(ValueError):
+    pass
+
+
+def _text(row, key, required=False, url=False):
+    value = row.get(key)
+    value = str(value).strip() if value is not None else ''
+    if required and not value:
+        raise RowError('{}: This field is required.'.format(key))
+    if url and not URL.match(value):
+        raise RowError('{}: Invalid URL.'.format(key))
+    return value or None
+
+
+def _state(row):
+    value = _text(row, 'state', required=True)
+    if value not in STATES:
+        raise RowError('state: Not a valid choice.')
+    return value
+
+
+def _genres(row):
+    value = row.get('genres') or []
+    if isinstance(value, str):
+        value = [genre.strip() for genre in value.split(',')]
+    value = [genre for genre in value if genre]
+    if not value:
+        raise RowError('genres: This field is required.')
+    invalid = [genre for genre in value if genre not in GENRES]
+    if invalid:
+        raise RowError("genres: '{}' is not a valid choice.".format(invalid[0]))
+    return ','.join(value)
+
+
+def _bool(row, key):
+    value = row.get(key)
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in TRUE
+
+
+def _int(row, key):
+    try:
+        return int(row.get(key))
+    except (TypeError, ValueError):
+        raise RowError('{}: Not a valid integer.'.format(key))
+
+
+def _datetime(row, key):
+    value = row.get(key)
+    try:
+        value = datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        raise RowError('{}: Not a valid datetime value.'.format(key))
+    # stored as UTC: SQLite drops the offset of aware values without converting
+    return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def venue_row(row):
+    # VenueForm rules
+    return {
+        "name": _text(row, 'name', required=True),
+        "city": _text(row, 'city', required=True),
+        "state": _state(row),
+        "address": _text(row, 'address', required=True),
+        "phone": _text(row, 'phone'),
+        "image_link": _text(row, 'image_link'),
+        "facebook_link": _text(row, 'facebook_link', url=True),
+        "genres": _genres(row),
+        "website": _text(row, 'website') or _text(row, 'website_link'),
+        "seeking_talent": _bool(row, 'seeking_talent'),
+        "seeking_description": _text(row, 'seeking_description'),
+    }
+
+
+def artist_row(row):
+    # ArtistForm rules
+    return {
+        "name": _text(row, 'name', required=True),
+        "city": _text(row, 'city', required=True),
+        "state": _state(row),
+        "phone": _text(row, 'phone'),
+        "image_link": _text(row, 'image_link'),
+        "facebook_link": _text(row, 'facebook_link', url=True),
+        "genres": _genres(row),
+        "website": _text(row, 'website' if row.get('website') else 'website_link', url=True),
+        "seeking_venue": _bool(row, 'seeking_venue'),
+        "seeking_description": _text(row, 'seeking_description'),
+    }
+
+
+def show_row(row):
+    # ShowForm rules; overlapping shows are rejected by the database
+    start_time = _datetime(row, 'start_time')
+    end_time = _datetime(row, 'end_time') if row.get('end_time') else availability.default_end(start_time)
+    if end_time <= start_time:
+        raise RowError('end_time: The end time must be after the start time.')
+    return {
+        "artist_id": _int(row, 'artist_id'),
+        "venue_id": _int(row, 'venue_id'),
+        "start_time": start_time,
+        "end_time": end_time,
+    }
+
+
+def read_rows(path, format):
+    # yields (line number, dict) without loading the file
+    with open(path, newline='', encoding='utf-8') as f:
+        if format == 'csv':
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    try:
+                        yield number, json.loads(line)
+                    except ValueError as error:
+                        yield number, error
+
+#----------------------------------------------------------------------------#
+# Batch insert.
+#----------------------------------------------------------------------------#
+
+def _copy(table, rows):
+    # PostgreSQL COPY ... FROM STDIN; None is written as an unquoted empty
+    # field, which COPY reads as NULL (the validators never produce '')
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[column] for column in columns])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert('COPY {} ({}) FROM STDIN WITH (FORMAT csv)'.format(table.name, ', '.join(columns)), buffer)
+
+
+def insert_rows(table, rows):
+    if db.engine.dialect.name == 'postgresql':
+        _copy(table, rows)
+    else:
+        # one executemany for the whole batch
+        db.session.execute(table.insert(), rows)
+
+
+class Importer:
+    def __init__(self, model, validate, rejects_path, batch_size):
+        self.model = model
+        self.validate = validate
+        self.rejects_path = rejects_path
+        self.batch_size = batch_size
+        self.inserted = self.rejected = 0
+        self.batch = []
+        self.rejects = None
+        self.started = time.monotonic()
+
+    def reject(self, number, row, error):
+        if self.rejects is None:
+            self.rejects = open(self.rejects_path, 'w', encoding='utf-8')
+        self.rejects.write(json.dumps({"line": number, "row": row, "error": str(error)}, default=str) + '\n')
+        self.rejected += 1
+
+    def add(self, number, row):
+        if isinstance(row, Exception):
+            return self.reject(number, None, row)
+        try:
+            self.batch.append((number, row, self.validate(row)))
+        except RowError as error:
+            return self.reject(number, row, error)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def check_batch(self, batch):
+        return batch
+
+    def flush(self):
+        batch, self.batch = self.check_batch(self.batch), []
+        if not batch:
+            return
+        # COPY goes through the raw driver cursor, so its errors are not wrapped
+        errors = (DBAPIError, db.engine.dialect.dbapi.Error)
+        try:
+            insert_rows(self.model.__table__, [values for _, _, values in batch])
+            db.session.commit()
+            self.inserted += len(batch)
+        except errors:
+            # isolate the offending rows instead of losing the whole batch
+            db.session.rollback()
+            for number, row, values in batch:
+                try:
+                    insert_rows(self.model.__table__, [values])
+                    db.session.commit()
+                    self.inserted += 1
+                except errors as error:
+                    db.session.rollback()
+                    self.reject(number, row, getattr(error, 'orig', error))
+        self.after_flush(batch)
+        self.progress()
+
+    def after_flush(self, batch):
+        pass
+
+    def progress(self):
+        elapsed = time.monotonic() - self.started
+        click.echo('{}: {} inserted, {} rejected, {:.0f} rows/s'.format(
+            self.model.__tablename__, self.inserted, self.rejected,
+            (self.inserted + self.rejected) / elapsed if elapsed else 0))
+
+    def close(self):
+        self.flush()
+        if self.rejects is not None:
+            self.rejects.close()
+            click.echo('Rejected rows written to {}'.format(self.rejects_path))
+
+
+class GenresImporter(Importer):
+    # venues / artists: rows are inserted with their comma-joined genres
+    # column, then linked to the genres table in one statement per batch
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        genres.lookup(sorted(GENRES))
+        db.session.commit()
+
+    def flush(self):
+        self.last_id = db.session.query(func.max(self.model.id)).scalar() or 0
+        super().flush()
+
+    def after_flush(self, batch):
+        genres.sync(self.model, self.model.id > self.last_id)
+        db.session.commit()
+
+
+class ShowImporter(Importer):
+    def __init__(self, *args, **kwargs):
+        super().__init__(Show, show_row, *args, **kwargs)
+        self.venue_ids = set()
+        self.artist_ids = set()
+
+    def check_batch(self, batch):
+        # one IN query per side for the whole batch
+        venue_ids = {values['venue_id'] for _, _, values in batch}
+        artist_ids = {values['artist_id'] for _, _, values in batch}
+        venue_ids = {id for (id,) in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids))}
+        artist_ids = {id for (id,) in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids))}
+        valid = []
+        for number, row, values in batch:
+            if values['venue_id'] not in venue_ids:
+                self.reject(number, row, "venue_id: venue doesn't exist.")
+            elif values['artist_id'] not in artist_ids:
+                self.reject(number, row, "artist_id: artist doesn't exist.")
+            else:
+                valid.append((number, row, values))
+        return valid
+
+    def after_flush(self, batch):
+        # counters are refreshed per batch, in the same units as the commit
+        venue_ids = {values['venue_id'] for _, _, values in batch}
+        artist_ids = {values['artist_id'] for _, _, values in batch}
+        counters.refresh(Venue, venue_ids)
+        counters.refresh(Artist, artist_ids)
+        db.session.commit()
+        self.venue_ids |= venue_ids
+        self.artist_ids |= artist_ids
+
+#----------------------------------------------------------------------------#
+# CLI.
+#----------------------------------------------------------------------------#
+
+cli = AppGroup('import', help='Bulk import venues, artists and shows from CSV or JSONL.')
+
+
+def _options(command):
+    command = click.option('--batch-size', default=5000, show_default=True, help='Rows per INSERT / COPY and commit.')(command)
+    command = click.option('--rejects', type=click.Path(dir_okay=False),
+                           help='Reject file (JSONL), defaults to <path>.rejects.jsonl.')(command)
+    command = click.option('--format', 'format', type=click.Choice(['csv', 'jsonl']),
+                           help='Input format, guessed from the extension by default.')(command)
+    return click.argument('path', type=click.Path(exists=True, dir_okay=False))(command)
+
+
+def _run(importer, path, format):
+    format = format or ('csv' if os.path.splitext(path)[1].lower() == '.csv' else 'jsonl')
+    for number, row in read_rows(path, format):
+        importer.add(number, row)
+    importer.close()
+
+
+@cli.command('venues')
+@_options
+def import_venues(path, format, rejects, batch_size):
+    """Import venues."""
+    _run(GenresImporter(Venue, venue_row, rejects or path + '.rejects.jsonl', batch_size), path, format)
+    cache.bump('venues')
+    cache.warn_if_local()
+
+
+@cli.command('artists')
+@_options
+def import_artists(path, format, rejects, batch_size):
+    """Import artists."""
+    _run(GenresImporter(Artist, artist_row, rejects or path + '.rejects.jsonl', batch_size), path, format)
+    cache.bump('artists')
+    cache.warn_if_local()
+
+
+@cli.command('shows')
+@_options
+def import_shows(path, format, rejects, batch_size):
+    """Import shows; venue_id and artist_id must exist."""
+    importer = ShowImporter(rejects or path + '.rejects.jsonl', batch_size)
+    _run(importer, path, format)
+    cache.bump('venues', *('venue:{}'.format(id) for id in importer.venue_ids),
+               *('artist:{}'.format(id) for id in importer.artist_ids))
+    cache.warn_if_local()
@@ -0,0 +1,38 @@
+from models import db
+import metrics
+
+#----------------------------------------------------------------------------#
+# Loaders.
+#
+# The read views build their data with generator functions that yield
+# SQLAlchemy statements and receive each statement's result, so the same
+# code runs on the Flask-SQLAlchemy session (load) and on an AsyncSession
+# (load_async, used by asgi.py). Results are fully buffered in both cases,
+# which also gives the rows fetched per request to metrics, and loaders
+# only touch eagerly loaded attributes.
+#----------------------------------------------------------------------------#
+
+
+def _buffered(result):
+    frozen = result.freeze()
+    metrics.rows_fetched(len(frozen.data))
+    return frozen()
+
+
+def load(loader, session=None):
+    session = session or db.session
+    try:
+        statement = next(loader)
+        while True:
+            statement = loader.send(_buffered(session.execute(statement)))
+    except StopIteration as stop:
+        return stop.value
+
+
+async def load_async(loader, session):
+    try:
+        statement = next(loader)
+        while True:
+            statement = loader.send(_buffered(await session.execute(statement)))
+    except StopIteration as stop:
+        return stop.value
@@ -0,0 +1,143 @@
+import logging
+import os
+import time
+from collections import Counter as StatementCounter
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Per-request SQL instrumentation.
+#
+# SQLAlchemy engine events time every statement executed while a request is
+# being handled; Flask hooks add the template render time. At the end of the
+# request the totals go to Prometheus histograms labelled by route, and any
+# statement executed N_PLUS_ONE_THRESHOLD times or more is reported as a
+# likely N+1 (one query per row of a previous query).
+#----------------------------------------------------------------------------#
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 50000)
+
+registry = CollectorRegistry()
+LABELS = ('method', 'route')
+request_seconds = Histogram('fyyur_request_seconds', 'Request handling time', LABELS, registry=registry)
+queries = Histogram('fyyur_request_queries', 'SQL statements per request', LABELS,
+                    buckets=COUNT_BUCKETS, registry=registry)
+db_seconds = Histogram('fyyur_request_db_seconds', 'Time spent in SQL per request', LABELS, registry=registry)
+render_seconds = Histogram('fyyur_request_render_seconds', 'Template render time per request', LABELS,
+                           registry=registry)
+rows = Histogram('fyyur_request_rows', 'Rows fetched by the read views per request', LABELS,
+                 buckets=ROW_BUCKETS, registry=registry)
+n_plus_one = Counter('fyyur_n_plus_one_total', 'Requests with a statement repeated N_PLUS_ONE_THRESHOLD times',
+                     LABELS, registry=registry)
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+        self.render_started = None
+        self.rows = 0
+        self.statements = StatementCounter()
+
+    def repeated(self, threshold):
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+
+def _stats():
+    return g.get('sql_stats') if has_request_context() else None
+
+
+def rows_fetched(count):
+    # counted by loading.load from the buffered results: cursor.rowcount is
+    # -1 for SELECTs on SQLite and unreliable on server-side cursors
+    stats = _stats()
+    if stats is not None:
+        stats.rows += count
+
+#----------------------------------------------------------------------------#
+# Hooks.
+#----------------------------------------------------------------------------#
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    stats = _stats()
+    if stats is None:
+        return
+    stats.queries += 1
+    stats.db_seconds += elapsed
+    # statements are parameterized, so the N queries of an N+1 share one text
+    stats.statements[statement] += 1
+
+
+def _before_render(sender, template, context, **extra):
+    stats = _stats()
+    if stats is not None:
+        stats.render_started = time.perf_counter()
+
+
+def _rendered(sender, template, context, **extra):
+    stats = _stats()
+    if stats is not None and stats.render_started is not None:
+        stats.render_seconds += time.perf_counter() - stats.render_started
+
+
+def init_app(app):
+    # Engine-level listeners cover the primary and every replica engine
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+
+    @app.before_request
+    def start_request_stats():
+        g.sql_stats = RequestStats()
+
+    @app.after_request
+    def record_request_stats(response):
+        # streamed bodies (stream_with_context) run their queries after this
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+        labels = (request.method, request.url_rule.rule if request.url_rule else 'unmatched')
+        request_seconds.labels(*labels).observe(time.perf_counter() - stats.started)
+        queries.labels(*labels).observe(stats.queries)
+        db_seconds.labels(*labels).observe(stats.db_seconds)
+        render_seconds.labels(*labels).observe(stats.render_seconds)
+        rows.labels(*labels).observe(stats.rows)
+
+        repeated = stats.repeated(app.config['N_PLUS_ONE_THRESHOLD'])
+        if repeated:
+            n_plus_one.labels(*labels).inc()
+            for statement, count in repeated:
+                logger.warning('likely N+1 on %s %s: %d x %s', request.method, request.path, count,
+                               ' '.join(statement.split())[:200])
+
+        if app.config['METRICS_DEBUG_HEADER']:
+            response.headers['X-SQL-Stats'] = 'queries={}; db_ms={:.1f}; render_ms={:.1f}; rows={}; repeated={}'.format(
+                stats.queries, stats.db_seconds * 1000, stats.render_seconds * 1000, stats.rows,
+                max(stats.statements.values(), default=0))
+        return response
+
+
+def render():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        # preforked workers (gunicorn.conf.py): each one writes its samples
+        # to that directory, and any of them answers with the sum
+        from prometheus_client import multiprocess
+        collector = CollectorRegistry()
+        multiprocess.MultiProcessCollector(collector)
+        return generate_latest(collector)
+    return generate_latest(registry)
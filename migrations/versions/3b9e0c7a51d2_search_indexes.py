@@ -0,0 +1,72 @@
+"""search indexes
+
+Revision ID: 3b9e0c7a51d2
+Revises: 17c5eb4d1ef1
+Create Date: 2026-10-18 10:03:17.228045
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9e0c7a51d2'
+down_revision = '17c5eb4d1ef1'
+branch_labels = None
+depends_on = None
+
+
+SEARCH_COLUMNS = {
+    'venues': ['name', 'city', 'state', 'genres'],
+    'artists': ['name', 'city', 'state', 'genres'],
+}
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # tsvector document for ranked full-text search over name, city,
+        # state and genres; trigram index for substring matches on name.
+        # The document expression must stay identical to search.DOCUMENTS.
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table, columns in SEARCH_COLUMNS.items():
+            document = " || ' ' || ".join("coalesce({}, '')".format(column) for column in columns)
+            op.execute(
+                "CREATE INDEX ix_{0}_search ON {0} USING gin (to_tsvector('simple', {1}))".format(table, document)
+            )
+            op.execute('CREATE INDEX ix_{0}_name_trgm ON {0} USING gin (name gin_trgm_ops)'.format(table))
+    elif dialect == 'sqlite':
+        # FTS5 external-content tables kept in sync with triggers
+        for table, columns in SEARCH_COLUMNS.items():
+            names = ', '.join(columns)
+            new_values = ', '.join('new.' + column for column in columns)
+            old_values = ', '.join('old.' + column for column in columns)
+            op.execute(
+                "CREATE VIRTUAL TABLE {0}_fts USING fts5({1}, content='{0}', content_rowid='id')".format(table, names)
+            )
+            op.execute(
+                "CREATE TRIGGER {0}_fts_ai AFTER INSERT ON {0} BEGIN "
+                "INSERT INTO {0}_fts(rowid, {1}) VALUES (new.id, {2}); END".format(table, names, new_values)
+            )
+            op.execute(
+                "CREATE TRIGGER {0}_fts_ad AFTER DELETE ON {0} BEGIN "
+                "INSERT INTO {0}_fts({0}_fts, rowid, {1}) VALUES ('delete', old.id, {2}); END".format(table, names, old_values)
+            )
+            op.execute(
+                "CREATE TRIGGER {0}_fts_au AFTER UPDATE ON {0} BEGIN "
+                "INSERT INTO {0}_fts({0}_fts, rowid, {1}) VALUES ('delete', old.id, {2}); "
+                "INSERT INTO {0}_fts(rowid, {1}) VALUES (new.id, {3}); END".format(table, names, old_values, new_values)
+            )
+            op.execute("INSERT INTO {0}_fts({0}_fts) VALUES ('rebuild')".format(table))
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for table in SEARCH_COLUMNS:
+            op.execute('DROP INDEX IF EXISTS ix_{}_name_trgm'.format(table))
+            op.execute('DROP INDEX IF EXISTS ix_{}_search'.format(table))
+    elif dialect == 'sqlite':
+        for table in SEARCH_COLUMNS:
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute('DROP TRIGGER IF EXISTS {}_fts_{}'.format(table, suffix))
+            op.execute('DROP TABLE IF EXISTS {}_fts'.format(table))
@@ -0,0 +1,43 @@
+"""show counters
+
+Revision ID: 5d1f2a8c9e40
+Revises: 3b9e0c7a51d2
+Create Date: 2026-10-18 11:26:54.018233
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d1f2a8c9e40'
+down_revision = '3b9e0c7a51d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venues', 'artists'):
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+
+    # backfill from the shows table
+    now = datetime.now(timezone.utc)
+    for table, key in (('venues', 'venue_id'), ('artists', 'artist_id')):
+        op.get_bind().execute(
+            sa.text(
+                'UPDATE {0} SET '
+                'upcoming_shows_count = (SELECT count(*) FROM shows WHERE shows.{1} = {0}.id AND shows.start_time >= :now), '
+                'past_shows_count = (SELECT count(*) FROM shows WHERE shows.{1} = {0}.id AND shows.start_time < :now)'
+                .format(table, key)
+            ).bindparams(sa.bindparam('now', now, type_=sa.DateTime(timezone=True)))
+        )
+
+
+def downgrade():
+    for table in ('venues', 'artists'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('past_shows_count')
+            batch_op.drop_column('upcoming_shows_count')
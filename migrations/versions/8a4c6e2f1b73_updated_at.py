@@ -0,0 +1,64 @@
+"""updated_at columns
+
+Revision ID: 8a4c6e2f1b73
+Revises: 5d1f2a8c9e40
+Create Date: 2026-10-18 12:40:02.771519
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a4c6e2f1b73'
+down_revision = '5d1f2a8c9e40'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('venues', 'artists', 'shows')
+
+
+def _rebuild(table, change):
+    # SQLite batch mode copies the table into a new one, which loses its
+    # triggers (the FTS sync of the search_indexes migration): put them back
+    bind = op.get_bind()
+    triggers = [sql for (sql,) in bind.execute(
+        sa.text("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = :table"), {'table': table})]
+    with op.batch_alter_table(table) as batch_op:
+        change(batch_op)
+    for sql in triggers:
+        op.execute(sql)
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # ADD COLUMN ... DEFAULT now() fills the existing rows as well
+        for table in TABLES:
+            op.add_column(table, sa.Column('updated_at', sa.DateTime(timezone=True),
+                                           server_default=sa.func.now(), nullable=False))
+    else:
+        # SQLite cannot add a column with a non-constant default: add it
+        # nullable, backfill, then rebuild the table to make it NOT NULL
+        now = datetime.now(timezone.utc)
+        for table in TABLES:
+            op.add_column(table, sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True))
+            op.get_bind().execute(
+                sa.text('UPDATE {} SET updated_at = :now'.format(table))
+                .bindparams(sa.bindparam('now', now, type_=sa.DateTime(timezone=True)))
+            )
+            _rebuild(table, lambda batch_op: batch_op.alter_column(
+                'updated_at', existing_type=sa.DateTime(timezone=True), nullable=False))
+    for table in TABLES:
+        op.create_index(op.f('ix_{}_updated_at'.format(table)), table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index(op.f('ix_{}_updated_at'.format(table)), table_name=table)
+        if op.get_bind().dialect.name == 'sqlite':
+            _rebuild(table, lambda batch_op: batch_op.drop_column('updated_at'))
+        else:
+            op.drop_column(table, 'updated_at')
@@ -0,0 +1,32 @@
+"""deletion tombstones
+
+Revision ID: a7d3e9f2c418
+Revises: f3a8d1c6b295
+Create Date: 2026-10-18 23:12:08.530114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3e9f2c418'
+down_revision = 'f3a8d1c6b295'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('deletions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('table_name', sa.String(length=50), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_deletions_table_name_deleted_at', 'deletions', ['table_name', 'deleted_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_deletions_table_name_deleted_at', table_name='deletions')
+    op.drop_table('deletions')
@@ -0,0 +1,41 @@
+"""hot query indexes
+
+Revision ID: b2e7d4a9c316
+Revises: 8a4c6e2f1b73
+Create Date: 2026-10-18 15:21:44.310862
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2e7d4a9c316'
+down_revision = '8a4c6e2f1b73'
+branch_labels = None
+depends_on = None
+
+
+# (name, table, columns); must stay in sync with the indexes in models.py
+INDEXES = [
+    # venue / artist pages, validators and counter refreshes
+    ('ix_shows_venue_id_start_time', 'shows', ['venue_id', 'start_time']),
+    ('ix_shows_artist_id_start_time', 'shows', ['artist_id', 'start_time']),
+    # /shows keyset pagination on (start_time, id) and counters reconcile
+    ('ix_shows_start_time_id', 'shows', ['start_time', 'id']),
+    # /venues grouped and ordered by state, city, id
+    ('ix_venues_state_city_id', 'venues', ['state', 'city', 'id']),
+    # case-insensitive name ordering and lookups
+    ('ix_venues_lower_name', 'venues', [sa.text('lower(name)')]),
+    ('ix_artists_lower_name', 'artists', [sa.text('lower(name)')]),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,103 @@
+"""normalized genres
+
+Revision ID: c4f1a7e8d205
+Revises: b2e7d4a9c316
+Create Date: 2026-10-18 16:05:12.904417
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f1a7e8d205'
+down_revision = 'b2e7d4a9c316'
+branch_labels = None
+depends_on = None
+
+
+# forms.GENRE_CHOICES at the time of this migration
+GENRES = [
+    'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk',
+    'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre', 'Pop',
+    'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul', 'Other',
+]
+
+# a value saved by the old artist form, which joined the names with ''
+# ("JazzBlues"); no genre name contains another one
+NAME = re.compile('|'.join(re.escape(name) for name in GENRES))
+JOINED = re.compile('(?:{})+'.format(NAME.pattern))
+
+ASSOCIATIONS = {
+    'venues': ('venue_genres', 'venue_id'),
+    'artists': ('artist_genres', 'artist_id'),
+}
+
+
+def _names(value):
+    # the genre names of a `genres` value, in order, without duplicates
+    names = []
+    for token in (value or '').split(','):
+        token = token.strip()
+        if token in GENRES or not JOINED.fullmatch(token):
+            names.append(token)
+        else:
+            names.extend(NAME.findall(token))
+    return [name for name in dict.fromkeys(names) if name]
+
+
+def upgrade():
+    genres = op.create_table('genres',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    associations = {}
+    for table, (association, key) in ASSOCIATIONS.items():
+        associations[table] = op.create_table(association,
+        sa.Column(key, sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint([key], ['{}.id'.format(table)], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['genre_id'], ['genres.id'], ),
+        sa.PrimaryKeyConstraint(key, 'genre_id')
+        )
+        op.create_index('ix_{}_genre_id_{}'.format(association, key), association, ['genre_id', key], unique=False)
+
+    # the genre names of every row. Names outside GENRES (entered before the
+    # form had choices, or imported) become genres of their own
+    bind = op.get_bind()
+    names = {table: [(id, _names(value)) for id, value in bind.execute(sa.text('SELECT id, genres FROM {}'.format(table)))]
+             for table in ASSOCIATIONS}
+    other = sorted({name for rows in names.values() for _, row_names in rows for name in row_names} - set(GENRES))
+    too_long = [name for name in other if len(name) > 50]
+    if too_long:
+        raise RuntimeError('genre names longer than 50 characters, shorten them first: {}'.format(', '.join(too_long)))
+    op.bulk_insert(genres, [{'name': name} for name in GENRES + other])
+
+    ids = {name: id for name, id in bind.execute(sa.text('SELECT name, id FROM genres'))}
+    for table, (association, key) in ASSOCIATIONS.items():
+        op.bulk_insert(associations[table], [{key: id, 'genre_id': ids[name]}
+                                             for id, row_names in names[table] for name in row_names])
+
+    # then rewrite the denormalized column from the associations, which also
+    # repairs the ''-joined values
+    if op.get_bind().dialect.name == 'postgresql':
+        joined = "SELECT string_agg(g.name, ',' ORDER BY g.name) FROM {0} a JOIN genres g ON g.id = a.genre_id WHERE a.{1} = {2}.id"
+    else:
+        joined = ("SELECT group_concat(name, ',') FROM ("
+                  "SELECT g.name FROM {0} a JOIN genres g ON g.id = a.genre_id WHERE a.{1} = {2}.id ORDER BY g.name)")
+    for table, (association, key) in ASSOCIATIONS.items():
+        op.execute(
+            "UPDATE {2} SET genres = ({3}) WHERE EXISTS (SELECT 1 FROM {0} a WHERE a.{1} = {2}.id)"
+            .format(association, key, table, joined.format(association, key, table))
+        )
+
+
+def downgrade():
+    for table, (association, key) in ASSOCIATIONS.items():
+        op.drop_index('ix_{}_genre_id_{}'.format(association, key), table_name=association)
+        op.drop_table(association)
+    op.drop_table('genres')
@@ -0,0 +1,107 @@
+"""show end_time and double-booking constraints
+
+Revision ID: e5b2c9d4f617
+Revises: c4f1a7e8d205
+Create Date: 2026-10-18 18:20:41.316052
+
+"""
+from datetime import timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b2c9d4f617'
+down_revision = 'c4f1a7e8d205'
+branch_labels = None
+depends_on = None
+
+
+# length given to the existing shows (SHOW_DEFAULT_MINUTES at the time)
+DEFAULT_DURATION = timedelta(hours=2)
+
+# a venue hosts one show at a time, an artist plays one show at a time
+KEYS = {
+    'venue_id': 'venue',
+    'artist_id': 'artist',
+}
+
+
+def _overlaps(key, exclude_self):
+    # the shows of NEW's venue / artist overlapping NEW, from the last one
+    # starting at or before NEW.start_time: one seek on the (key, start_time)
+    # index plus the shows starting inside NEW's interval
+    return (
+        "SELECT 1 FROM shows WHERE {0} = NEW.{0} "
+        "AND start_time >= coalesce((SELECT max(start_time) FROM shows "
+        "WHERE {0} = NEW.{0} AND start_time <= NEW.start_time{1}), NEW.start_time) "
+        "AND start_time < NEW.end_time AND end_time > NEW.start_time{1}"
+    ).format(key, ' AND id != NEW.id' if exclude_self else '')
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    op.add_column('shows', sa.Column('end_time', sa.DateTime(timezone=True), nullable=True))
+
+    # existing shows last DEFAULT_DURATION, cut short by the next show at the
+    # same venue or by the same artist so that they satisfy the constraints
+    shows = sa.table('shows',
+        sa.column('id', sa.Integer), sa.column('venue_id', sa.Integer), sa.column('artist_id', sa.Integer),
+        sa.column('start_time', sa.DateTime(timezone=True)), sa.column('end_time', sa.DateTime(timezone=True)))
+    following = [
+        sa.type_coerce(
+            sa.func.lead(shows.c.start_time).over(partition_by=shows.c[key], order_by=(shows.c.start_time, shows.c.id)),
+            sa.DateTime(timezone=True),
+        ).label('next_' + key)
+        for key in KEYS
+    ]
+    if dialect == 'postgresql':
+        bounds = sa.select(shows.c.id, *following).subquery()
+        op.execute(
+            shows.update().where(shows.c.id == bounds.c.id).values(end_time=sa.func.least(
+                shows.c.start_time + DEFAULT_DURATION, *(bounds.c['next_' + key] for key in KEYS)))
+        )
+        op.alter_column('shows', 'end_time', nullable=False)
+        op.create_check_constraint('ck_shows_end_time', 'shows', 'end_time >= start_time')
+        # GiST exclusion constraints: the database rejects overlapping shows,
+        # concurrent inserts included, with an O(log n) index probe
+        op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        for key, name in KEYS.items():
+            op.execute(
+                'ALTER TABLE shows ADD CONSTRAINT shows_{}_overlap_excl '
+                'EXCLUDE USING gist ({} WITH =, tstzrange(start_time, end_time) WITH &&)'.format(name, key)
+            )
+    else:
+        # SQLite has no date arithmetic on SQLAlchemy's storage format:
+        # compute the end times here, then enforce the rule with triggers
+        rows = [row for row in op.get_bind().execute(sa.select(shows.c.id, shows.c.start_time, *following))
+                if row[1] is not None]
+        if rows:
+            op.get_bind().execute(
+                shows.update().where(shows.c.id == sa.bindparam('show_id')).values(end_time=sa.bindparam('end')),
+                [{"show_id": row[0], "end": min(end for end in (row[1] + DEFAULT_DURATION, *row[2:]) if end is not None)}
+                 for row in rows],
+            )
+        for key, name in KEYS.items():
+            for event, columns, exclude_self in (('insert', 'INSERT', False),
+                                                 ('update', 'UPDATE OF {}, start_time, end_time'.format(key), True)):
+                op.execute(
+                    "CREATE TRIGGER shows_{0}_overlap_{1} BEFORE {2} ON shows "
+                    "WHEN NEW.end_time < NEW.start_time OR EXISTS ({3}) "
+                    "BEGIN SELECT RAISE(ABORT, 'show overlaps another show of this {0}'); END"
+                    .format(name, event, columns, _overlaps(key, exclude_self))
+                )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for name in KEYS.values():
+            op.execute('ALTER TABLE shows DROP CONSTRAINT shows_{}_overlap_excl'.format(name))
+        op.drop_constraint('ck_shows_end_time', 'shows', type_='check')
+    else:
+        for name in KEYS.values():
+            for event in ('insert', 'update'):
+                op.execute('DROP TRIGGER shows_{}_overlap_{}'.format(name, event))
+    with op.batch_alter_table('shows') as batch_op:
+        batch_op.drop_column('end_time')
@@ -0,0 +1,32 @@
+"""version_id columns for optimistic locking
+
+Revision ID: f3a8d1c6b295
+Revises: e5b2c9d4f617
+Create Date: 2026-10-18 21:05:37.482913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a8d1c6b295'
+down_revision = 'e5b2c9d4f617'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('venues', 'artists')
+
+
+def upgrade():
+    # a constant default: existing rows start at version 1 without a rewrite
+    # (PostgreSQL 11+) and SQLite can add it in place
+    for table in TABLES:
+        op.add_column(table, sa.Column('version_id', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('version_id')
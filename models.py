@@ -1,14 +1,46 @@
-from flask_sqlalchemy import SQLAlchemy
+from datetime import datetime, timezone
 from sqlalchemy.sql import func
 
-db = SQLAlchemy()
+from routing import RoutingSQLAlchemy
+
+db = RoutingSQLAlchemy()
+
+
+def utcnow():
+    return datetime.now(timezone.utc)
 
 #----------------------------------------------------------------------------#
 # Models.
 #----------------------------------------------------------------------------#
 
+class Genre(db.Model):
+    __tablename__ = 'genres'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False, unique=True)
+
+    def __repr__(self) -> str:
+        return f"Genre({self.id}, {self.name})"
+
+# the association tables are indexed both ways: (entity, genre) for detail
+# pages, (genre, entity) for genre browsing and facet counts
+venue_genres = db.Table('venue_genres',
+    db.Column('venue_id', db.Integer, db.ForeignKey('venues.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genres.id'), primary_key=True),
+    db.Index('ix_venue_genres_genre_id_venue_id', 'genre_id', 'venue_id'),
+)
+
+artist_genres = db.Table('artist_genres',
+    db.Column('artist_id', db.Integer, db.ForeignKey('artists.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genres.id'), primary_key=True),
+    db.Index('ix_artist_genres_genre_id_artist_id', 'genre_id', 'artist_id'),
+)
+
 class Venue(db.Model):
     __tablename__ = 'venues'
+    __table_args__ = (
+        db.Index('ix_venues_state_city_id', 'state', 'city', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -18,11 +50,25 @@ class Venue(db.Model):
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
-    genres = db.Column(db.String(120), nullable=False)
+    # comma-joined copy of `genres`, kept for the full-text search indexes
+    # and exports; written together with it by genres.assign()
+    genres_text = db.Column('genres', db.String(120), nullable=False)
+    genres = db.relationship('Genre', secondary=venue_genres, lazy=True, order_by=Genre.name)
     website = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.Text, default=None)
+    # maintained by counters.py, reconciled periodically as shows move into the past
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # drives ETag / Last-Modified of the pages that show this row
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True,
+                           default=utcnow, onupdate=utcnow, server_default=func.now())
     shows = db.relationship('Show', backref='venue', lazy=True, cascade="save-update, merge, delete")
+    # optimistic locking: incremented by every ORM UPDATE, which only
+    # applies WHERE version_id still matches (StaleDataError otherwise)
+    version_id = db.Column(db.Integer, nullable=False, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version_id}
 
     def __repr__(self) -> str:
         return f"Venue({self.id}, {self.name})"
@@ -35,25 +81,71 @@ class Artist(db.Model):
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    # comma-joined copy of `genres`, kept for the full-text search indexes
+    # and exports; written together with it by genres.assign()
+    genres_text = db.Column('genres', db.String(120))
+    genres = db.relationship('Genre', secondary=artist_genres, lazy=True, order_by=Genre.name)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean,default=False)
     seeking_description = db.Column(db.Text)
+    # maintained by counters.py, reconciled periodically as shows move into the past
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # drives ETag / Last-Modified of the pages that show this row
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True,
+                           default=utcnow, onupdate=utcnow, server_default=func.now())
     shows = db.relationship('Show', backref='artist', lazy=True, cascade="save-update, merge, delete")
+    # optimistic locking: incremented by every ORM UPDATE, which only
+    # applies WHERE version_id still matches (StaleDataError otherwise)
+    version_id = db.Column(db.Integer, nullable=False, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version_id}
 
     def __repr__(self) -> str:
         return f"Artist({self.id}, {self.name})"
 
 class Show(db.Model):
     __tablename__ = 'shows'
+    __table_args__ = (
+        db.Index('ix_shows_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_shows_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_shows_start_time_id', 'start_time', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     start_time = db.Column(db.DateTime(timezone=True), default=func.NOW())
+    # shows of one venue, or of one artist, never overlap: enforced by the
+    # show_end_time migration (exclusion constraints / triggers), checked
+    # up front by availability.py
+    end_time = db.Column(db.DateTime(timezone=True), nullable=False)
     artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'), nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'), nullable=False)
+    # drives ETag / Last-Modified of the pages that show this row
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True,
+                           default=utcnow, onupdate=utcnow, server_default=func.now())
 
     def __repr__(self) -> str:
         start_time = self.start_time.strftime("%Y-%m-%dT%H:%M:%S.%f%z")
         return f"Show({self.id}, {start_time}, {self.artist_id}, {self.venue_id})"
+
+class Deletion(db.Model):
+    # one row per deleted venue / artist / show, written by deletions.py in
+    # the deleting transaction: deletions move no updated_at
+    __tablename__ = 'deletions'
+    __table_args__ = (
+        db.Index('ix_deletions_table_name_deleted_at', 'table_name', 'deleted_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(50), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime(timezone=True), nullable=False, default=utcnow)
+
+    def __repr__(self) -> str:
+        return f"Deletion({self.table_name}, {self.entity_id})"
+
+# case-insensitive name ordering and lookups
+db.Index('ix_venues_lower_name', func.lower(Venue.name))
+db.Index('ix_artists_lower_name', func.lower(Artist.name))
@@ -0,0 +1,132 @@
+import hmac
+
+from flask import Blueprint, Response, abort, current_app, jsonify, render_template, request, stream_with_context
+from sqlalchemy import select
+
+from models import db, Genre, Venue, Artist
+from cache import cache
+from loading import load
+from views import list_validator
+import conditional
+import exporter
+import genres
+import metrics
+import suggest
+import templating
+
+bp = Blueprint('pages', __name__)
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#
+# Home page, genres, suggestions, exports and the operational endpoints;
+# venues, artists and shows have blueprints of their own.
+#----------------------------------------------------------------------------#
+
+def recent_listings():
+    recent_venues = (yield select(Venue.id, Venue.name, Venue.image_link).order_by(db.desc(Venue.id)).limit(10)).all()
+    recent_artists = (yield select(Artist.id, Artist.name, Artist.image_link).order_by(db.desc(Artist.id)).limit(10)).all()
+    return [venue._asdict() for venue in recent_venues], [artist._asdict() for artist in recent_artists]
+
+@bp.route('/')
+def index():
+    def render():
+        recent_venues, recent_artists = cache.get_or_set(conditional.cache_key('index', validator), ('venues', 'artists'), lambda: load(recent_listings()))
+        return render_template('pages/home.html', venues = recent_venues, artists = recent_artists)
+
+    validator = load(list_validator(Venue, Artist))
+    return conditional.respond(render, validator, conditional.last_modified(*validator[::2]), use_modified_since=False)
+
+
+
+@bp.route('/search/suggest')
+def search_suggest():
+    # as-you-type suggestions for venue and artist names, served from the
+    # in-process prefix index (no database round trip once it is built)
+    k = request.args.get('k', current_app.config['SUGGEST_TOP_K'], type=int)
+    k = min(max(k, 1), current_app.config['SUGGEST_MAX_K'])
+    suggestions = suggest.suggest(request.args.get('q', ''), k, request.args.get('type'))
+    return jsonify(suggestions=suggestions)
+
+
+#  Genres
+#  ----------------------------------------------------------------
+
+@bp.route('/genres')
+def browse_genres():
+    # venue and artist counts per genre, one grouped query
+    def render():
+        data = cache.get_or_set(conditional.cache_key('genres', validator), ('venues', 'artists'), genres.genre_counts)
+        return render_template('pages/genres.html', genres=data)
+
+    validator = load(list_validator(Venue, Artist))
+    return conditional.respond(render, validator, conditional.last_modified(validator[0], validator[2]), use_modified_since=False)
+
+@bp.route('/genres/<genre>')
+def show_genre(genre):
+    # venues and artists in a genre, with per-state facet counts and a
+    # ?state= drill-down
+    genre = Genre.query.filter_by(name=genre).first_or_404()
+    state = request.args.get('state')
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = current_app.config['GENRE_RESULTS_PER_PAGE']
+
+    def build():
+        genre_venues, more_venues = genres.browse(Venue, genre, state, page, per_page)
+        genre_artists, more_artists = genres.browse(Artist, genre, state, page, per_page)
+        return {
+            "name": genre.name,
+            "states": genres.state_counts(genre),
+            "venues": genre_venues,
+            "artists": genre_artists,
+            "has_next": more_venues or more_artists,
+        }
+
+    def render():
+        data = cache.get_or_set(
+            conditional.cache_key('genre:{}:{}:{}:{}'.format(genre.id, state, page, per_page), validator),
+            ('venues', 'artists'), build)
+        return render_template('pages/genre.html', genre=data, state=state, page=page)
+
+    validator = load(list_validator(Venue, Artist))
+    return conditional.respond(render, validator, conditional.last_modified(validator[0], validator[2]), use_modified_since=False)
+
+#  Export
+#  ----------------------------------------------------------------
+
+@bp.route('/export/<any(venues, artists, shows):table>.<any(csv, ndjson):format>')
+def export_table(table, format):
+    # bulk export for analytics: streamed from a server-side cursor, gzipped
+    # on the fly when accepted; ?since=<iso timestamp> for incremental runs
+    token = current_app.config['EXPORT_API_TOKEN']
+    if not token:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), 'Bearer ' + token):
+        abort(401)
+    try:
+        since = exporter.parse_since(request.args.get('since'))
+    except ValueError:
+        abort(400)
+    gzip = request.accept_encodings['gzip'] > 0
+    # rows changed from then on are picked up by the next run with since=<watermark>
+    watermark = exporter.watermark()
+
+    response = Response(
+        stream_with_context(exporter.export(table, format, since, gzip, current_app.config['EXPORT_BATCH_SIZE'])),
+        mimetype='text/csv' if format == 'csv' else 'application/x-ndjson',
+    )
+    if gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    response.headers['Content-Disposition'] = 'attachment; filename={}.{}'.format(table, format)
+    response.headers['X-Export-Watermark'] = watermark.isoformat()
+    return response
+
+@bp.route('/cache/stats')
+def cache_stats():
+    return jsonify(dict(cache.stats(), fragments=templating.stats(current_app)))
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    # per-route query count, DB time, render time and rows, for Prometheus
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
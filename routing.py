@@ -0,0 +1,122 @@
+import os
+import random
+import sqlite3
+
+import click
+from flask import current_app, g, has_request_context, request
+from flask.cli import AppGroup
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import event, exc, orm
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import Pool
+
+#----------------------------------------------------------------------------#
+# Read-replica routing.
+#
+# GET / HEAD requests read from one of SQLALCHEMY_REPLICA_URIS, picked once
+# per request; other requests (create_*, edit_*, delete_venue), CLI commands,
+# migrations and any flush use the primary. A write leaves a short-lived
+# cookie that pins the client to the primary, so the redirect after a write
+# reads it back even if the replicas lag behind.
+#----------------------------------------------------------------------------#
+
+READ_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+STICKY_COOKIE = 'db_primary'
+
+
+def replica_keys(app):
+    return ['replica_{}'.format(i) for i in range(len(app.config['SQLALCHEMY_REPLICA_URIS']))]
+
+
+def request_bind(app):
+    # bind key for the current request's reads: None means the primary
+    if not has_request_context():
+        return None
+    if 'db_bind' not in g:
+        keys = replica_keys(app)
+        use_replica = keys and request.method in READ_METHODS and STICKY_COOKIE not in request.cookies
+        g.db_bind = random.choice(keys) if use_replica else None
+    return g.db_bind
+
+
+class RoutingSession(SignallingSession):
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        bind = None if self._flushing else request_bind(self.app)
+        if bind is None:
+            return super().get_bind(mapper, clause)
+        return get_state(self.app).db.get_engine(self.app, bind=bind)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+#----------------------------------------------------------------------------#
+# Forking servers.
+#
+# A pooled connection must never be used by two processes: its socket and
+# protocol state would be shared. gunicorn.conf.py empties the pools of the
+# preloaded app before each fork, and the pool listeners below discard any
+# connection that was opened by another process all the same.
+#----------------------------------------------------------------------------#
+
+def _record_pid(dbapi_connection, connection_record):
+    connection_record.info['pid'] = os.getpid()
+
+
+def _check_pid(dbapi_connection, connection_record, connection_proxy):
+    if connection_record.info['pid'] != os.getpid():
+        # drop it without closing: the process that opened it still owns it
+        connection_record.dbapi_connection = connection_proxy.dbapi_connection = None
+        raise exc.DisconnectionError('connection opened by process {}, pool used by {}'.format(
+            connection_record.info['pid'], os.getpid()))
+
+
+def dispose_engines(app):
+    # closes the pooled connections of the primary and replica engines
+    state = get_state(app)
+    with app.app_context():
+        for bind in [None] + replica_keys(app):
+            state.db.get_engine(app, bind=bind).dispose()
+
+
+def init_app(app):
+    event.listen(Pool, 'connect', _record_pid)
+    event.listen(Pool, 'checkout', _check_pid)
+
+    # each replica is an extra Flask-SQLAlchemy bind, so it gets the same
+    # engine options (pool, pre-ping) as the primary
+    binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+    binds.update(zip(replica_keys(app), app.config['SQLALCHEMY_REPLICA_URIS']))
+    app.config['SQLALCHEMY_BINDS'] = binds
+
+    @app.after_request
+    def stick_to_primary(response):
+        if replica_keys(app) and request.method not in READ_METHODS:
+            response.set_cookie(STICKY_COOKIE, '1', max_age=app.config['REPLICA_STICKY_SECONDS'],
+                                httponly=True, samesite='Lax')
+        if app.debug and 'db_bind' in g:
+            response.headers['X-DB-Bind'] = g.db_bind or 'primary'
+        return response
+
+#----------------------------------------------------------------------------#
+# CLI.
+#----------------------------------------------------------------------------#
+
+cli = AppGroup('replicas', help='Local stand-in for replication between SQLite databases.')
+
+
+@cli.command('copy')
+def copy_replicas():
+    """Copy the primary SQLite database over every SQLite replica."""
+    primary = make_url(current_app.config['SQLALCHEMY_DATABASE_URI'])
+    if primary.get_backend_name() != 'sqlite':
+        raise click.ClickException('only SQLite primaries can be copied; use real replication elsewhere')
+    source = sqlite3.connect(primary.database)
+    for key, uri in zip(replica_keys(current_app), current_app.config['SQLALCHEMY_REPLICA_URIS']):
+        target = sqlite3.connect(make_url(uri).database)
+        source.backup(target)
+        target.close()
+        click.echo('{}: copied from {}'.format(key, primary.database))
+    source.close()
@@ -0,0 +1,239 @@
+import json
+from bisect import bisect_left, insort
+from datetime import timezone
+from itertools import islice
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import func, literal, select, union_all
+from sqlalchemy.exc import DBAPIError
+
+import availability
+from cache import cache
+import counters
+from importer import RowError, show_row
+from models import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Batch and recurring show creation.
+#
+# A batch costs the same handful of statements whatever its size:
+#   - one query for the venues and artists it references,
+#   - one UNION ALL of index-backed overlap probes per OVERLAP_CHUNK shows,
+#   - one bulk insert (INSERT ... RETURNING / executemany),
+#   - on SQLite, one query for the last new id,
+#   - the counter refresh.
+# All of them run in one transaction. Each show gets its own result. With
+# atomic, a single rejected show rejects the whole batch.
+#----------------------------------------------------------------------------#
+
+# shows per overlap query: 2 probes each, within SQLite's compound SELECT
+# and bound parameter limits
+OVERLAP_CHUNK = 50
+
+KEYS = {'venue_id': Venue, 'artist_id': Artist}
+
+
+class BatchError(ValueError):
+    pass
+
+
+def _expand(item):
+    # validated rows of one item. An item with an `rrule` (RFC 5545, e.g.
+    # FREQ=WEEKLY;BYDAY=FR;COUNT=12) gives one show per occurrence,
+    # starting at its start_time and as long as its first show
+    if not isinstance(item, dict):
+        raise RowError('Not a JSON object.')
+    values = show_row(item)
+    if not item.get('rrule'):
+        return [values]
+    # dateutil is only loaded once a recurring show comes in
+    from dateutil.rrule import rrulestr
+    limit = current_app.config['SHOW_BATCH_MAX']
+    duration = values['end_time'] - values['start_time']
+    # expanded in naive UTC (show_row returns UTC): dateutil 2.6 rejects
+    # UNTIL next to an aware dtstart, and UNTIL=...Z is UTC by RFC 5545
+    # (ignoretz drops the Z)
+    dtstart = values['start_time'].replace(tzinfo=None)
+    try:
+        starts = [start.replace(tzinfo=timezone.utc)
+                  for start in islice(rrulestr(item['rrule'], dtstart=dtstart, ignoretz=True), limit + 1)]
+    except (TypeError, ValueError) as error:
+        raise RowError('rrule: {}'.format(error))
+    if len(starts) > limit:
+        raise RowError('rrule: more than {} occurrences.'.format(limit))
+    return [dict(values, start_time=start, end_time=start + duration) for start in starts]
+
+
+def _reject(result, error):
+    result.update(status='rejected', error=error)
+
+
+def _check_references(shows):
+    # one query for every venue and artist id of the batch
+    ids = {key: {values[key] for _, values in shows} for key in KEYS}
+    existing = set(db.session.execute(union_all(*(
+        select(literal(key).label('key'), model.id).where(model.id.in_(ids[key]))
+        for key, model in KEYS.items()
+    ))))
+    for result, values in shows:
+        for key, model in KEYS.items():
+            if (key, values[key]) not in existing:
+                _reject(result, "{}: {} doesn't exist.".format(key, model.__name__.lower()))
+                break
+
+
+def _check_batch_overlaps(shows):
+    # shows of the batch against each other, first come first served: a
+    # sorted list of accepted intervals per venue / artist
+    booked = {}
+    for result, values in shows:
+        interval = (values['start_time'], values['end_time'], result['item'])
+        lists = [booked.setdefault((key, values[key]), []) for key in KEYS]
+        for key, intervals in zip(KEYS, lists):
+            i = bisect_left(intervals, interval)
+            clash = [other for other in intervals[max(i - 1, 0):i + 1]
+                     if other[0] < interval[1] and interval[0] < other[1]]
+            if clash:
+                _reject(result, '{}: overlaps item {} of the batch.'.format(key, clash[0][2]))
+                break
+        else:
+            for intervals in lists:
+                insort(intervals, interval)
+
+
+def _check_overlaps(shows):
+    # existing shows overlapping the batch
+    for start in range(0, len(shows), OVERLAP_CHUNK):
+        chunk = shows[start:start + OVERLAP_CHUNK]
+        probes = [
+            select(literal(i).label('show'), literal(key).label('key'), Show.start_time, Show.end_time)
+            .where(availability.overlap_condition(model, values[key], values['start_time'], values['end_time']))
+            for i, (_, values) in enumerate(chunk)
+            for key, model in KEYS.items()
+        ]
+        for i, key, start_time, end_time in db.session.execute(union_all(*probes)):
+            result = chunk[i][0]
+            if 'error' not in result:
+                _reject(result, '{}: already booked from {:%Y-%m-%d %H:%M} to {:%Y-%m-%d %H:%M}.'.format(
+                    key, start_time, end_time))
+
+
+def _insert(rows):
+    # ids of the new shows, in the order of rows
+    table = Show.__table__
+    if db.engine.dialect.name == 'postgresql':
+        # a venue hosts one show at a time: (venue_id, start_time) tells
+        # which returned id belongs to which row
+        ids = {(venue_id, start_time): id for id, venue_id, start_time in db.session.execute(
+            table.insert().values(rows).returning(table.c.id, table.c.venue_id, table.c.start_time))}
+        return [ids[(row['venue_id'], row['start_time'])] for row in rows]
+    # no RETURNING on SQLite before SQLAlchemy 2.0; the insert holds the
+    # database write lock, so the rows take the next rowids in order
+    db.session.execute(table.insert(), rows)
+    last = db.session.execute(select(func.max(table.c.id))).scalar()
+    return list(range(last - len(rows) + 1, last + 1))
+
+
+def create_shows(items, atomic=False):
+    # items: dicts with venue_id, artist_id, start_time and optionally
+    # end_time and rrule. Returns one result per show (per occurrence for
+    # recurring items), in order.
+    results, shows = [], []
+    for number, item in enumerate(items):
+        try:
+            rows = _expand(item)
+        except RowError as error:
+            results.append({"item": number, "status": "rejected", "error": str(error)})
+            continue
+        for values in rows:
+            result = {"item": number, "venue_id": values['venue_id'], "artist_id": values['artist_id'],
+                      "start_time": values['start_time'].isoformat(), "end_time": values['end_time'].isoformat()}
+            results.append(result)
+            shows.append((result, values))
+    if len(shows) > current_app.config['SHOW_BATCH_MAX']:
+        raise BatchError('more than {} shows in one batch'.format(current_app.config['SHOW_BATCH_MAX']))
+
+    for check in (_check_references, _check_batch_overlaps, _check_overlaps):
+        check([(result, values) for result, values in shows if 'error' not in result])
+    accepted = [(result, values) for result, values in shows if 'error' not in result]
+    if atomic and len(accepted) < len(results):
+        for result, _ in accepted:
+            _reject(result, 'another show of the batch was rejected.')
+        return results
+    if not accepted:
+        return results
+
+    try:
+        ids = _insert([values for _, values in accepted])
+        venue_ids = {values['venue_id'] for _, values in accepted}
+        artist_ids = {values['artist_id'] for _, values in accepted}
+        counters.refresh(Venue, venue_ids)
+        counters.refresh(Artist, artist_ids)
+        db.session.commit()
+    except DBAPIError as error:
+        db.session.rollback()
+        if not availability.is_overlap_error(error):
+            raise
+        # booked concurrently: rejected by the overlap constraint
+        for result, _ in accepted:
+            _reject(result, 'the batch overlaps a show booked in the meantime.')
+        return results
+
+    for (result, _), id in zip(accepted, ids):
+        result.update(status='created', show_id=id)
+    cache.bump('venues', *('venue:{}'.format(id) for id in venue_ids), *('artist:{}'.format(id) for id in artist_ids))
+    return results
+
+#----------------------------------------------------------------------------#
+# CLI.
+#----------------------------------------------------------------------------#
+
+cli = AppGroup('shows', help='Create shows in batches or from a recurrence rule.')
+
+
+def _report(results):
+    created = 0
+    for result in results:
+        if result['status'] == 'created':
+            created += 1
+            click.echo('created #{show_id}: venue {venue_id}, artist {artist_id}, {start_time} - {end_time}'.format(**result))
+        else:
+            click.echo('rejected item {}{}: {}'.format(
+                result['item'], ' ({})'.format(result['start_time']) if 'start_time' in result else '', result['error']))
+    click.echo('{} created, {} rejected'.format(created, len(results) - created))
+
+
+@cli.command('create')
+@click.option('--venue-id', required=True, type=int)
+@click.option('--artist-id', required=True, type=int)
+@click.option('--start', 'start_time', required=True, help='First start time, ISO 8601 (naive means UTC).')
+@click.option('--end', 'end_time', help='First end time, SHOW_DEFAULT_MINUTES after the start by default.')
+@click.option('--rrule', help='Recurrence, e.g. "FREQ=WEEKLY;BYDAY=FR;COUNT=12".')
+@click.option('--atomic', is_flag=True, help='Create nothing unless every show can be created.')
+def create_command(venue_id, artist_id, start_time, end_time, rrule, atomic):
+    """Create a show, or one show per occurrence of --rrule."""
+    item = {"venue_id": venue_id, "artist_id": artist_id, "start_time": start_time, "end_time": end_time, "rrule": rrule}
+    try:
+        _report(create_shows([item], atomic))
+        cache.warn_if_local()
+    except BatchError as error:
+        raise click.ClickException(str(error))
+
+
+@cli.command('batch')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--atomic', is_flag=True, help='Create nothing unless every show can be created.')
+def batch_command(path, atomic):
+    """Create the shows of a JSON file: a list of items, or {"shows": [...]} as POSTed to /shows/batch."""
+    with open(path, encoding='utf-8') as f:
+        body = json.load(f)
+    items = body.get('shows') if isinstance(body, dict) else body
+    if not isinstance(items, list):
+        raise click.ClickException('expected a list of shows')
+    try:
+        _report(create_shows(items, atomic))
+        cache.warn_if_local()
+    except BatchError as error:
+        raise click.ClickException(str(error))
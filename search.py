@@ -0,0 +1,89 @@
+import re
+
+from sqlalchemy import column, func, literal_column, or_, select, table
+from models import db, Venue, Artist
+
+#----------------------------------------------------------------------------#
+# Search backends.
+#
+# PostgreSQL: ranked tsvector match over name, city, state and genres, plus a
+# trigram-indexed substring match on name (see the search_indexes migration).
+# SQLite: FTS5 external-content tables kept in sync by triggers.
+# Anything else falls back to ILIKE.
+#----------------------------------------------------------------------------#
+
+# must stay identical to the index expression created by the migration
+DOCUMENTS = {
+    model.__tablename__: literal_column(
+        "to_tsvector('simple', " + " || ' ' || ".join(
+            "coalesce({}.{}, '')".format(model.__tablename__, name)
+            for name in ('name', 'city', 'state', 'genres')
+        ) + ")"
+    )
+    for model in (Venue, Artist)
+}
+
+WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def _like_pattern(term):
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return '%{}%'.format(escaped)
+
+
+def _match_postgresql(statement, model, term, words):
+    document = DOCUMENTS[model.__tablename__]
+    tsquery = func.to_tsquery('simple', ' & '.join(word + ':*' for word in words))
+    statement = statement.where(or_(
+        document.op('@@')(tsquery),
+        model.name.ilike(_like_pattern(term), escape='\\'),
+    ))
+    rank = func.ts_rank(document, tsquery) + func.similarity(model.name, term)
+    return statement, rank.desc()
+
+
+def _match_sqlite(statement, model, term, words):
+    fts_name = model.__tablename__ + '_fts'
+    fts = table(fts_name, column('rowid'), column('rank'))
+    # the hidden rank column is bm25() of the match, lower is better
+    hits = select(fts.c.rowid.label('id'), fts.c.rank.label('rank')) \
+     .where(literal_column(fts_name).op('MATCH')(' '.join('"{}"*'.format(word) for word in words))) \
+     .subquery()
+    return statement.join(hits, hits.c.id == model.id), hits.c.rank
+
+
+def _match_like(statement, model, term, words):
+    pattern = _like_pattern(term)
+    statement = statement.where(or_(*(
+        field.ilike(pattern, escape='\\')
+        for field in (model.name, model.city, model.state, model.genres_text)
+    )))
+    return statement, func.lower(model.name)
+
+
+MATCHERS = {
+    'postgresql': _match_postgresql,
+    'sqlite': _match_sqlite,
+}
+
+
+def search(model, term, page=1, per_page=20, dialect=None):
+    # loader (see loading.py) returning (total, rows) where rows carry id,
+    # name and num_upcoming_shows; matching, ranking and counting are one
+    # query, the upcoming show counts are the maintained counters. dialect
+    # defaults to the primary engine's.
+    statement = select(
+        model.id,
+        model.name,
+        model.upcoming_shows_count.label('num_upcoming_shows'),
+        func.count().over().label('total'),
+    )
+    words = WORD.findall(term.lower())
+    order = model.name
+    if words:
+        matcher = MATCHERS.get(dialect or db.engine.dialect.name, _match_like)
+        statement, order = matcher(statement, model, term, words)
+    rows = (yield statement.order_by(order, model.id)
+        .offset((page - 1) * per_page).limit(per_page)).all()
+    total = rows[0].total if rows else 0
+    return total, rows
@@ -0,0 +1,280 @@
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import func
+
+from cache import cache
+import availability
+import counters
+import genres
+from choices import STATE_CHOICES, GENRE_CHOICES
+from importer import insert_rows
+from models import db, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Synthetic dataset generator.
+#
+# `flask seed` bulk loads venues, artists and shows with production-like
+# skew: cities weighted by metro population, a long tail of genres, and
+# Zipf-distributed show counts (a few venues and artists host most shows).
+# The same --seed always produces the same data.
+#----------------------------------------------------------------------------#
+
+# metro population in 100k, per state; states follow from their cities
+CITIES = {
+    'AL': [('Birmingham', 11), ('Huntsville', 5), ('Mobile', 4)],
+    'AK': [('Anchorage', 4), ('Fairbanks', 1)],
+    'AZ': [('Phoenix', 49), ('Tucson', 10), ('Flagstaff', 1)],
+    'AR': [('Little Rock', 7), ('Fayetteville', 5)],
+    'CA': [('Los Angeles', 130), ('San Francisco', 47), ('San Diego', 33), ('Sacramento', 24), ('Oakland', 14)],
+    'CO': [('Denver', 30), ('Colorado Springs', 8), ('Boulder', 3)],
+    'CT': [('Hartford', 12), ('New Haven', 9)],
+    'DE': [('Wilmington', 7), ('Dover', 2)],
+    'DC': [('Washington', 63)],
+    'FL': [('Miami', 62), ('Tampa', 32), ('Orlando', 27), ('Jacksonville', 16)],
+    'GA': [('Atlanta', 61), ('Savannah', 4), ('Athens', 2)],
+    'HI': [('Honolulu', 10), ('Hilo', 2)],
+    'ID': [('Boise', 8), ('Idaho Falls', 2)],
+    'IL': [('Chicago', 94), ('Springfield', 2), ('Champaign', 2)],
+    'IN': [('Indianapolis', 21), ('Bloomington', 2)],
+    'IA': [('Des Moines', 7), ('Iowa City', 2)],
+    'KS': [('Wichita', 6), ('Lawrence', 1)],
+    'KY': [('Louisville', 13), ('Lexington', 5)],
+    'LA': [('New Orleans', 13), ('Baton Rouge', 9), ('Lafayette', 5)],
+    'ME': [('Portland', 6), ('Bangor', 2)],
+    'MT': [('Billings', 2), ('Missoula', 1)],
+    'NE': [('Omaha', 10), ('Lincoln', 3)],
+    'NV': [('Las Vegas', 23), ('Reno', 5)],
+    'NH': [('Manchester', 4), ('Portsmouth', 1)],
+    'NJ': [('Newark', 21), ('Jersey City', 7), ('Asbury Park', 1)],
+    'NM': [('Albuquerque', 9), ('Santa Fe', 2)],
+    'NY': [('New York', 190), ('Buffalo', 11), ('Rochester', 11), ('Albany', 9)],
+    'NC': [('Charlotte', 27), ('Raleigh', 14), ('Asheville', 5)],
+    'ND': [('Fargo', 3), ('Bismarck', 1)],
+    'OH': [('Columbus', 21), ('Cleveland', 21), ('Cincinnati', 22)],
+    'OK': [('Oklahoma City', 14), ('Tulsa', 10)],
+    'OR': [('Portland', 25), ('Eugene', 4)],
+    'MD': [('Baltimore', 28), ('Annapolis', 1)],
+    'MA': [('Boston', 49), ('Worcester', 9), ('Cambridge', 1)],
+    'MI': [('Detroit', 43), ('Grand Rapids', 11), ('Ann Arbor', 4)],
+    'MN': [('Minneapolis', 37), ('Duluth', 3)],
+    'MS': [('Jackson', 6), ('Oxford', 1)],
+    'MO': [('St. Louis', 28), ('Kansas City', 22)],
+    'PA': [('Philadelphia', 62), ('Pittsburgh', 24)],
+    'RI': [('Providence', 16)],
+    'SC': [('Charleston', 8), ('Columbia', 8), ('Greenville', 9)],
+    'SD': [('Sioux Falls', 3), ('Rapid City', 1)],
+    'TN': [('Nashville', 20), ('Memphis', 13), ('Knoxville', 9)],
+    'TX': [('Houston', 71), ('Dallas', 76), ('Austin', 23), ('San Antonio', 26)],
+    'UT': [('Salt Lake City', 13), ('Provo', 6)],
+    'VT': [('Burlington', 2)],
+    'VA': [('Richmond', 13), ('Norfolk', 18)],
+    'WA': [('Seattle', 40), ('Spokane', 6), ('Tacoma', 9)],
+    'WV': [('Charleston', 2), ('Morgantown', 1)],
+    'WI': [('Milwaukee', 16), ('Madison', 7)],
+    'WY': [('Cheyenne', 1), ('Jackson', 1)],
+}
+
+# rough share of the catalog per genre, most common first
+GENRE_WEIGHTS = {
+    'Rock n Roll': 16, 'Pop': 14, 'Hip-Hop': 12, 'Alternative': 10, 'Jazz': 8, 'Electronic': 8,
+    'Country': 7, 'R&B': 6, 'Blues': 5, 'Folk': 5, 'Punk': 4, 'Soul': 4, 'Heavy Metal': 4, 'Funk': 3,
+    'Reggae': 3, 'Classical': 3, 'Instrumental': 2, 'Musical Theatre': 2, 'Other': 2,
+}
+
+VENUE_WORDS = (['The', 'Old', 'Blue', 'Red', 'Golden', 'Velvet', 'Iron', 'Electric', 'Silver', 'Crooked', 'Lucky'],
+               ['Room', 'Hall', 'Lounge', 'Tavern', 'Theatre', 'Club', 'Garage', 'Ballroom', 'Cellar', 'Hop', 'Den'])
+ARTIST_WORDS = (['Wild', 'Midnight', 'Static', 'Neon', 'Quiet', 'Broken', 'Northern', 'Paper', 'Lonely', 'Cosmic'],
+                ['Petals', 'Wolves', 'Saints', 'Rivers', 'Machines', 'Sparrows', 'Ghosts', 'Sax Band', 'Kids', 'Echoes'])
+
+
+# draws per show before it is dropped for lack of a free slot
+SLOT_ATTEMPTS = 10
+
+
+def _weighted(rng, items, weights):
+    # returns a sampler of k items
+    cumulative = list(accumulate(weights))
+    return lambda k=1: rng.choices(items, cum_weights=cumulative, k=k)
+
+
+def _zipf_weights(n, s=1.1):
+    return [1 / (rank ** s) for rank in range(1, n + 1)]
+
+
+class Generator:
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        places = [(state, city) for state, cities in CITIES.items() for city, _ in cities]
+        assert {state for state, _ in places} == {value for value, _ in STATE_CHOICES}
+        self.place = _weighted(self.rng, places, [weight for cities in CITIES.values() for _, weight in cities])
+        names = [value for value, _ in GENRE_CHOICES]
+        self.genre = _weighted(self.rng, names, [GENRE_WEIGHTS[name] for name in names])
+
+    def _genres(self):
+        # one to three distinct genres
+        picked = []
+        for name in self.genre(self.rng.choice((1, 1, 2, 2, 3))):
+            if name not in picked:
+                picked.append(name)
+        return ','.join(picked)
+
+    def _name(self, words, number):
+        first, second = words
+        return '{} {} {}'.format(self.rng.choice(first), self.rng.choice(second), number)
+
+    def _phone(self):
+        return '{}-{}-{:04d}'.format(self.rng.randint(201, 989), self.rng.randint(200, 999), self.rng.randint(0, 9999))
+
+    def venue(self, number):
+        state, city = self.place()[0]
+        return {
+            "name": self._name(VENUE_WORDS, number),
+            "city": city,
+            "state": state,
+            "address": '{} {} St'.format(self.rng.randint(1, 9999), self.rng.choice(ARTIST_WORDS[0])),
+            "phone": self._phone(),
+            "image_link": None,
+            "facebook_link": 'https://www.facebook.com/venue{}'.format(number),
+            "genres": self._genres(),
+            "website": None,
+            "seeking_talent": self.rng.random() < 0.3,
+            "seeking_description": None,
+        }
+
+    def artist(self, number):
+        state, city = self.place()[0]
+        return {
+            "name": self._name(ARTIST_WORDS, number),
+            "city": city,
+            "state": state,
+            "phone": self._phone(),
+            "image_link": None,
+            "facebook_link": 'https://www.facebook.com/artist{}'.format(number),
+            "genres": self._genres(),
+            "website": None,
+            "seeking_venue": self.rng.random() < 0.3,
+            "seeking_description": None,
+        }
+
+    def shows(self, venue_ids, artist_ids, count, now, duration, booked=None):
+        # popularity is Zipf-distributed over a shuffled id order; shows fill
+        # `duration`-long slots over the past year and the next six months.
+        # A venue or artist already booked in the slot (by a generated show,
+        # or by an existing one passed in `booked`) gets a new draw, and
+        # after SLOT_ATTEMPTS the show is dropped (the busiest venues and
+        # artists run out of slots), so fewer than `count` shows may come out.
+        venue_ids, artist_ids = list(venue_ids), list(artist_ids)
+        self.rng.shuffle(venue_ids)
+        self.rng.shuffle(artist_ids)
+        venue = _weighted(self.rng, venue_ids, _zipf_weights(len(venue_ids)))
+        artist = _weighted(self.rng, artist_ids, _zipf_weights(len(artist_ids)))
+        start, slots = slot_grid(now, duration)
+        venue_slots, artist_slots = booked or (set(), set())
+        for venue_id, artist_id in zip(venue(count), artist(count)):
+            for _ in range(SLOT_ATTEMPTS):
+                slot = self.rng.randrange(slots)
+                if (venue_id, slot) not in venue_slots and (artist_id, slot) not in artist_slots:
+                    break
+                venue_id, artist_id = venue()[0], artist()[0]
+            else:
+                continue
+            venue_slots.add((venue_id, slot))
+            artist_slots.add((artist_id, slot))
+            yield {
+                "venue_id": venue_id,
+                "artist_id": artist_id,
+                "start_time": start + slot * duration,
+                "end_time": start + (slot + 1) * duration,
+            }
+
+
+def slot_grid(now, duration):
+    # first slot start and number of slots the generated shows are placed in
+    start = now.replace(minute=0, second=0, microsecond=0) - timedelta(days=365)
+    return start, int(timedelta(days=365 + 182) // duration)
+
+
+def booked_slots(now, duration):
+    # slots taken by the shows already in the database: seeding a database
+    # that has data must not double-book its venues and artists
+    start, slots = slot_grid(now, duration)
+    end = start + slots * duration
+    venue_slots, artist_slots = set(), set()
+    rows = db.session.query(Show.venue_id, Show.artist_id, Show.start_time, Show.end_time) \
+        .filter(Show.start_time < end, Show.end_time > start).yield_per(10000)
+    for venue_id, artist_id, start_time, end_time in rows:
+        first = max(int((availability.as_utc(start_time) - start) // duration), 0)
+        # every slot the show overlaps, end excluded
+        last = min(-int(-(availability.as_utc(end_time) - start) // duration), slots)
+        for slot in range(first, last):
+            venue_slots.add((venue_id, slot))
+            artist_slots.add((artist_id, slot))
+    return venue_slots, artist_slots
+
+
+def _load(model, rows, total, batch_size):
+    # insert in batches; returns the range of new ids
+    first = (db.session.query(func.max(model.id)).scalar() or 0) + 1
+    started = time.monotonic()
+    batch = []
+    number = 0
+
+    def flush():
+        insert_rows(model.__table__, batch)
+        db.session.commit()
+        batch.clear()
+        click.echo('\r{}: {}/{} ({:.0f} rows/s)'.format(
+            model.__tablename__, number, total, number / max(time.monotonic() - started, 1e-6)), nl=False)
+
+    for number, row in enumerate(rows, 1):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    if total:
+        click.echo()
+    return range(first, (db.session.query(func.max(model.id)).scalar() or 0) + 1)
+
+
+@click.command('seed')
+@click.option('--venues', default=1000, show_default=True)
+@click.option('--artists', default=2000, show_default=True)
+@click.option('--shows', default=20000, show_default=True)
+@click.option('--seed', default=42, show_default=True, help='Random seed; the same seed gives the same data.')
+@click.option('--batch-size', default=10000, show_default=True, help='Rows per INSERT / COPY and commit.')
+@with_appcontext
+def seed_command(venues, artists, shows, seed, batch_size):
+    """Fill the database with a synthetic dataset, e.g. flask seed --venues 100000 --artists 200000 --shows 2000000."""
+    generator = Generator(seed)
+    now = datetime.now(timezone.utc)
+    genres.lookup([value for value, _ in GENRE_CHOICES])
+    db.session.commit()
+
+    venue_ids = _load(Venue, (generator.venue(number) for number in range(1, venues + 1)), venues, batch_size)
+    artist_ids = _load(Artist, (generator.artist(number) for number in range(1, artists + 1)), artists, batch_size)
+    if venue_ids:
+        genres.sync(Venue, Venue.id >= venue_ids.start)
+    if artist_ids:
+        genres.sync(Artist, Artist.id >= artist_ids.start)
+    db.session.commit()
+
+    all_venue_ids = [id for (id,) in db.session.query(Venue.id)]
+    all_artist_ids = [id for (id,) in db.session.query(Artist.id)]
+    if shows and all_venue_ids and all_artist_ids:
+        duration = timedelta(minutes=current_app.config['SHOW_DEFAULT_MINUTES'])
+        booked = booked_slots(now, duration)
+        _load(Show, generator.shows(all_venue_ids, all_artist_ids, shows, now, duration, booked), shows, batch_size)
+
+    click.echo('refreshing show counters')
+    counters.refresh(Venue, now=now)
+    counters.refresh(Artist, now=now)
+    db.session.commit()
+    cache.bump('venues', 'artists')
+    cache.warn_if_local()
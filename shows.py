@@ -0,0 +1,196 @@
+import json
+from datetime import datetime, timezone
+
+from flask import (Blueprint, Response, abort, current_app, flash, jsonify, redirect, render_template, request,
+                   stream_with_context, url_for)
+from sqlalchemy import select, tuple_
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Venue, Artist, Show
+from cache import cache
+from loading import load
+from views import is_upcoming, list_validator
+import availability
+import conditional
+import counters
+import schedule
+
+bp = Blueprint('shows', __name__)
+
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+def encode_cursor(start_time, show_id):
+    return '{}_{}'.format(start_time.isoformat(), show_id)
+
+def decode_cursor(cursor):
+    try:
+        start_time, _, show_id = cursor.rpartition('_')
+        return datetime.fromisoformat(start_time), int(show_id)
+    except ValueError:
+        abort(400)
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+#  Shows
+#  ----------------------------------------------------------------
+
+def shows_query(after=None):
+    # plain columns joined in SQL, so listing shows never lazy-loads
+    # venue / artist rows; ordered by the (start_time, id) keyset
+    statement = select(
+        Show.id,
+        Show.start_time,
+        Show.end_time,
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+    ).join(Venue, Show.venue_id == Venue.id) \
+     .join(Artist, Show.artist_id == Artist.id) \
+     .order_by(Show.start_time, Show.id)
+    if after:
+        statement = statement.where(tuple_(Show.start_time, Show.id) > decode_cursor(after))
+    return statement
+
+def shows_args():
+    # keyset pagination: ?after=<cursor>&limit=<n>, the cursor is the
+    # (start_time, id) of the last show of the previous page
+    limit = request.args.get('limit', current_app.config['SHOWS_PER_PAGE'], type=int)
+    return request.args.get('after'), min(max(limit, 1), current_app.config['SHOWS_MAX_PER_PAGE'])
+
+def shows_page(after, limit):
+    rows = (yield shows_query(after).limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].start_time, rows[-1].id)
+    return rows, next_cursor
+
+def show_json(show):
+    return {
+        "id": show.id,
+        "venue_id": show.venue_id,
+        "venue_name": show.venue_name,
+        "artist_id": show.artist_id,
+        "artist_name": show.artist_name,
+        "artist_image_link": show.artist_image_link,
+        "start_time": show.start_time.isoformat(),
+        "end_time": show.end_time.isoformat(),
+    }
+
+@bp.route('/shows')
+def shows():
+    # displays list of shows at /shows
+    def render():
+        rows, next_cursor = load(shows_page(*shows_args()))
+        data = list()
+        for show in rows:
+            data.append({
+                "venue_id": show.venue_id,
+                "venue_name": show.venue_name,
+                "artist_id": show.artist_id,
+                "artist_name": show.artist_name,
+                "artist_image_link": show.artist_image_link,
+                "start_time": show.start_time,
+            })
+        return render_template('pages/shows.html', shows=data, next_cursor=next_cursor)
+
+    validator = load(list_validator(Show, Venue, Artist))
+    return conditional.respond(render, validator, conditional.last_modified(*validator[::2]), use_modified_since=False)
+
+@bp.route('/shows.json')
+def shows_json():
+    rows, next_cursor = load(shows_page(*shows_args()))
+    return jsonify(shows=[show_json(show) for show in rows], next=next_cursor)
+
+@bp.route('/shows.ndjson')
+def shows_ndjson():
+    # streams every show, one JSON document per line; rows are fetched from a
+    # server-side cursor in batches so memory stays flat whatever the table size
+    statement = shows_query(request.args.get('after')).execution_options(stream_results=True)
+
+    def generate():
+        for show in db.session.execute(statement).yield_per(current_app.config['SHOWS_STREAM_BATCH_SIZE']):
+            yield json.dumps(show_json(show)) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@bp.route('/shows/create')
+def create_shows():
+    # renders form. do not touch.
+    from forms import ShowForm
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+@bp.route('/shows/create', methods=['POST'])
+def create_show_submission():
+    # called to create new shows in the db, upon submitting new show listing form
+
+    from forms import ShowForm
+
+    form = ShowForm(request.form)
+    start_time = form.start_time.data
+    end_time = form.end_time.data
+    venue_id = request.form.get('venue_id', type=int)
+    artist_id = request.form.get('artist_id', type=int)
+
+    # ensure that the provided ids exist and that neither the venue nor the
+    # artist is booked at that time
+    if start_time is None:
+        flash('An error occurred. Invalid start time, Show could not be listed.')
+    elif end_time is not None and end_time <= start_time:
+        flash('An error occurred. The end time must be after the start time, Show could not be listed.')
+    elif not (venue_id and Venue.query.get(venue_id) and artist_id and Artist.query.get(artist_id)):
+        flash("An error occurred. the provided IDs don't exist, Show could not be listed.")
+    else:
+        end_time = end_time or availability.default_end(start_time)
+        conflict = availability.conflict(venue_id, artist_id, start_time, end_time)
+        if conflict:
+            flash('An error occurred. Show could not be listed: {}.'.format(conflict))
+            return redirect(url_for('pages.index'))
+
+        new_show = Show()
+        new_show.artist_id = artist_id
+        new_show.venue_id = venue_id
+        new_show.start_time = start_time
+        new_show.end_time = end_time
+
+        try:
+            db.session.add(new_show)
+            counters.show_added(new_show.venue_id, new_show.artist_id, is_upcoming(start_time, datetime.now(timezone.utc)))
+            db.session.commit()
+            cache.bump('venues', 'venue:{}'.format(new_show.venue_id), 'artist:{}'.format(new_show.artist_id))
+            # on successful db insert, flash success
+            flash('Show was successfully listed!')
+        except IntegrityError:
+            # booked concurrently: rejected by the overlap constraint
+            db.session.rollback()
+            flash('An error occurred. Show could not be listed: the venue or the artist was booked in the meantime.')
+        except:
+            db.session.rollback()
+            # on unsuccessful db insert, flash an error instead.
+            flash('An error occurred. Show could not be listed.')
+            # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+        finally:
+            db.session.close()
+
+    return redirect(url_for('pages.index'))
+
+@bp.route('/shows/batch', methods=['POST'])
+def create_shows_batch():
+    # {"shows": [{"venue_id", "artist_id", "start_time", "end_time"?, "rrule"?}, ...],
+    #  "atomic": false}; one result per show, see schedule.py
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or not isinstance(body.get('shows'), list):
+        abort(400)
+    try:
+        results = schedule.create_shows(body['shows'], bool(body.get('atomic')))
+    except schedule.BatchError as error:
+        return jsonify(error=str(error)), 400
+    created = sum(result['status'] == 'created' for result in results)
+    return jsonify(created=created, rejected=len(results) - created, results=results)
@@ -0,0 +1,188 @@
+import bisect
+import re
+import threading
+import time
+from datetime import timedelta
+
+from flask import current_app
+from sqlalchemy import event
+
+from models import db, utcnow, Deletion, Venue, Artist
+
+#----------------------------------------------------------------------------#
+# In-process prefix index over venue and artist names for typeahead.
+#
+# Every word of a name is indexed under each of its prefixes (up to
+# MAX_PREFIX characters) in a list kept sorted by name, so a lookup is one
+# dict access plus a scan that stops after k matches. The index is built
+# once per process on first use and then kept current from SQLAlchemy
+# session events. Changes made by other processes (the other gunicorn
+# workers, CLI imports) are applied per entity, at most every
+# SUGGEST_REFRESH_SECONDS: the rows whose indexed updated_at moved and the
+# Deletion tombstones since the previous read, which looks back
+# COMMIT_LAG_SECONDS for writes committed late. Raw SQL that leaves
+# updated_at alone is only picked up by a rebuild().
+#----------------------------------------------------------------------------#
+
+MAX_PREFIX = 12
+
+WORD = re.compile(r'\w+', re.UNICODE)
+
+KINDS = {Venue: 'venue', Artist: 'artist'}
+
+
+def _words(text):
+    return WORD.findall((text or '').lower())
+
+
+class PrefixIndex:
+    def __init__(self, max_prefix=MAX_PREFIX):
+        self.max_prefix = max_prefix
+        self.built = False
+        # changes stamped before `synced` are in the index
+        self.synced = None
+        self.checked = 0.0
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self._prefixes = {}
+        self._entries = {}
+        # changes applied while a rebuild runs, replayed on the new index
+        self._replay = None
+
+    def _prefixes_of(self, words):
+        return {word[:length] for word in words for length in range(1, min(len(word), self.max_prefix) + 1)}
+
+    @staticmethod
+    def _entry(kind, id, name):
+        return ((name or '').lower(), kind, id, name, tuple(_words(name)))
+
+    def add(self, kind, id, name):
+        with self._lock:
+            self.remove(kind, id)
+            entry = self._entry(kind, id, name)
+            self._entries[(kind, id)] = entry
+            for prefix in self._prefixes_of(entry[4]):
+                bisect.insort(self._prefixes.setdefault(prefix, []), entry)
+
+    def remove(self, kind, id):
+        with self._lock:
+            entry = self._entries.pop((kind, id), None)
+            if entry is None:
+                return
+            for prefix in self._prefixes_of(entry[4]):
+                entries = self._prefixes[prefix]
+                del entries[bisect.bisect_left(entries, entry)]
+                if not entries:
+                    del self._prefixes[prefix]
+
+    def apply(self, kind, id, name):
+        # a committed change; name None for a deletion
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append((kind, id, name))
+            if not self.built:
+                return
+            if name is None:
+                self.remove(kind, id)
+            else:
+                self.add(kind, id, name)
+
+    def lookup(self, q, k, kind=None):
+        words = _words(q)
+        if not words:
+            return []
+        # one reference: a rebuild swaps in a new dict rather than filling this one
+        prefixes = self._prefixes
+        # scan the rarest list; every query word must prefix a word of the name
+        candidates = min((prefixes.get(word[:self.max_prefix], ()) for word in words), key=len)
+        results = []
+        for _, entry_kind, id, name, name_words in candidates:
+            if kind and entry_kind != kind:
+                continue
+            if all(any(name_word.startswith(word) for name_word in name_words) for word in words):
+                results.append({"type": entry_kind, "id": id, "name": name})
+                if len(results) == k:
+                    break
+        return results
+
+    def rebuild(self, force=True):
+        # built into new structures, each list sorted once, and swapped in
+        # whole: lookups never see a half-built index
+        with self._build_lock:
+            if self.built and not force:
+                return
+            with self._lock:
+                self._replay = []
+                # read before the scan: writes during it are caught up later
+                synced = utcnow()
+            entries, prefixes = {}, {}
+            for model, kind in KINDS.items():
+                for id, name in db.session.query(model.id, model.name):
+                    entry = entries[(kind, id)] = self._entry(kind, id, name)
+                    for prefix in self._prefixes_of(entry[4]):
+                        prefixes.setdefault(prefix, []).append(entry)
+            for prefix_entries in prefixes.values():
+                prefix_entries.sort()
+            with self._lock:
+                self._entries, self._prefixes = entries, prefixes
+                self.synced, self.checked = synced, time.monotonic()
+                replay, self._replay = self._replay, None
+                self.built = True
+                for change in replay:
+                    self.apply(*change)
+
+    def catch_up(self, lag, every=0):
+        with self._lock:
+            # requests that queued on the lock find the work done
+            if time.monotonic() - self.checked < every:
+                return
+            since, self.synced = self.synced - timedelta(seconds=lag), utcnow()
+            self.checked = time.monotonic()
+            for model, kind in KINDS.items():
+                # deletions first: SQLite may hand a deleted id to a new row
+                for (id,) in db.session.query(Deletion.entity_id).filter(
+                        Deletion.table_name == model.__tablename__, Deletion.deleted_at >= since):
+                    self.apply(kind, id, None)
+                for id, name in db.session.query(model.id, model.name).filter(model.updated_at >= since):
+                    self.apply(kind, id, name)
+
+
+index = PrefixIndex()
+
+
+def suggest(q, k, kind=None):
+    if not index.built:
+        index.rebuild(force=False)
+    elif time.monotonic() - index.checked >= current_app.config['SUGGEST_REFRESH_SECONDS']:
+        index.catch_up(current_app.config['COMMIT_LAG_SECONDS'], current_app.config['SUGGEST_REFRESH_SECONDS'])
+    return index.lookup(q, k, kind)
+
+#----------------------------------------------------------------------------#
+# Session hooks.
+#----------------------------------------------------------------------------#
+
+def _record_changes(session, flush_context):
+    pending = session.info.setdefault('suggest_pending', [])
+    for obj in session.new | session.dirty:
+        kind = KINDS.get(type(obj))
+        if kind:
+            pending.append((kind, obj.id, obj.name))
+    for obj in session.deleted:
+        kind = KINDS.get(type(obj))
+        if kind:
+            pending.append((kind, obj.id, None))
+
+
+def _apply_changes(session):
+    for change in session.info.pop('suggest_pending', None) or ():
+        index.apply(*change)
+
+
+def _discard_changes(session):
+    session.info.pop('suggest_pending', None)
+
+
+def init_app(app):
+    event.listen(db.session, 'after_flush', _record_changes)
+    event.listen(db.session, 'after_commit', _apply_changes)
+    event.listen(db.session, 'after_rollback', _discard_changes)
@@ -0,0 +1,79 @@
+import os
+
+from flask import g, has_request_context
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+from cache import cache, LRUCache
+
+#----------------------------------------------------------------------------#
+# Jinja bytecode cache and fragment caching.
+#
+# Compiled templates are written to JINJA_BYTECODE_CACHE_DIR, so a new
+# worker loads bytecode instead of parsing and compiling every template.
+#
+# {% cache key[, ttl] %}...{% endcache %} renders its body once per entity
+# version: key is a version name as bumped by the write paths ('venue:3',
+# 'artist:7') or a list of them, and the rendered fragment is stored in a
+# bounded in-process LRU under the template, the line and the current
+# versions. An edit bumps the version, so the next render misses and the old
+# fragment ages out. Only cache markup derived from those entities (not the
+# show dates, which are formatted per locale and timezone).
+#----------------------------------------------------------------------------#
+
+
+class FragmentCache(Extension):
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        # the same key may guard different markup in different templates
+        args = [nodes.Const('{}:{}'.format(parser.name, lineno)), parser.parse_expression()]
+        args.append(parser.parse_expression() if parser.stream.skip_if('comma') else nodes.Const(None))
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render', args), [], [], body).set_lineno(lineno)
+
+    def _render(self, location, key, ttl, caller):
+        store = self.environment.fragment_cache
+        if store is None:
+            return caller()
+        names = [key] if isinstance(key, str) else list(key)
+        key = '{}|{}'.format(location, '|'.join('{}={}'.format(name, version)
+                                                for name, version in zip(names, versions(names))))
+        value = store.get(key)
+        if value is None:
+            value = caller()
+            store.set(key, value, ttl)
+        return value
+
+
+def versions(names):
+    # a venue or artist usually appears several times on a page: look each
+    # version up once per request
+    if not has_request_context():
+        return cache.versions(names)
+    known = g.setdefault('fragment_versions', {})
+    missing = [name for name in names if name not in known]
+    if missing:
+        known.update(zip(missing, cache.versions(missing)))
+    return [known[name] for name in names]
+
+
+def init_app(app):
+    directory = app.config['JINJA_BYTECODE_CACHE_DIR']
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+    app.jinja_env.add_extension(FragmentCache)
+    if app.config['FRAGMENT_CACHE_MAX_ENTRIES']:
+        app.jinja_env.fragment_cache = LRUCache(app.config['FRAGMENT_CACHE_MAX_ENTRIES'],
+                                                app.config['FRAGMENT_CACHE_TTL'])
+
+
+def stats(app):
+    store = app.jinja_env.fragment_cache
+    return store.stats() if store is not None else None
@@ -0,0 +1,299 @@
+from datetime import datetime, timezone
+from itertools import groupby
+
+from flask import Blueprint, abort, current_app, flash, redirect, render_template, request, url_for
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.exc import StaleDataError
+
+from models import db, Venue, Artist, Show
+from cache import cache
+from loading import load
+from views import apply_changes, availability_response, conflict_response, entity_validator, is_stale, is_upcoming, list_validator
+import conditional
+import counters
+import genres
+import search
+
+bp = Blueprint('venues', __name__)
+
+#----------------------------------------------------------------------------#
+# Controllers.
+#----------------------------------------------------------------------------#
+
+#  Venues
+#  ----------------------------------------------------------------
+
+def venue_areas(state, page, per_page):
+    # num_upcoming_shows is the counter maintained on Venue, so the listing is
+    # a single query with no aggregate. Rows come back ordered by
+    # (state, city) so they can be grouped into areas in one pass.
+    statement = select(
+        Venue.id,
+        Venue.name,
+        Venue.city,
+        Venue.state,
+        Venue.upcoming_shows_count.label('num_upcoming_shows'),
+    )
+    if state:
+        statement = statement.where(Venue.state == state)
+    # fetch one extra row to know whether there is a next page without a COUNT(*)
+    rows = (yield statement.order_by(Venue.state, Venue.city, Venue.id)
+        .offset((page - 1) * per_page).limit(per_page + 1)).all()
+    has_next = len(rows) > per_page
+
+    data = []
+    for (city, venue_state), area_venues in groupby(rows[:per_page], key=lambda row: (row.city, row.state)):
+        data.append({
+            "city": city,
+            "state": venue_state,
+            "venues": [{
+                "id": venue.id,
+                "name": venue.name,
+                "num_upcoming_shows": venue.num_upcoming_shows,
+            } for venue in area_venues],
+        })
+    states = [item.state for item in (yield select(Venue.state).distinct().order_by(Venue.state)).all()]
+    return data, states, has_next
+
+@bp.route('/venues')
+def venues():
+    # paginated, and filtered by state for the per-state drill-down
+    state = request.args.get('state')
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = current_app.config['VENUES_PER_PAGE']
+
+    def render():
+        data, states, has_next = cache.get_or_set(
+            conditional.cache_key('venues:{}:{}:{}'.format(state, page, per_page), validator), ('venues',),
+            lambda: load(venue_areas(state, page, per_page)),
+        )
+        return render_template('pages/venues.html', areas=data, states=states, state=state, page=page, has_next=has_next)
+
+    validator = load(list_validator(Venue))
+    return conditional.respond(render, validator, conditional.last_modified(validator[0]), use_modified_since=False)
+
+@bp.route('/venues/search', methods=['GET', 'POST'])
+def search_venues():
+  # ranked search over name, city, state and genres, backed by the full-text
+  # indexes; upcoming show counts come from the same query.
+  # search for "Hop" should return "The Musical Hop".
+  search_term = request.values.get('search_term', '')
+  page = max(request.values.get('page', 1, type=int), 1)
+  total, result_venues = load(search.search(Venue, search_term, page, current_app.config['SEARCH_RESULTS_PER_PAGE']))
+  response={
+    "count": total,
+    "data": []
+    }
+  for venue in result_venues:
+    response["data"].append({
+        "id": venue.id,
+        "name": venue.name,
+        "num_upcoming_shows": venue.num_upcoming_shows,
+      })
+  has_next = page * current_app.config['SEARCH_RESULTS_PER_PAGE'] < total
+  return render_template('pages/search_venues.html', results=response, search_term=search_term, page=page, has_next=has_next)
+
+def venue_page(venue_id):
+    # the venue, its shows and their artists are loaded in a single query,
+    # then split into past / upcoming against one "now" for the whole request
+    venue = (yield select(Venue).options(joinedload(Venue.shows).joinedload(Show.artist), selectinload(Venue.genres))
+        .where(Venue.id == venue_id)).unique().scalar_one_or_none()
+    if venue is None:
+        abort(404)
+    now = datetime.now(timezone.utc)
+    data = {
+        "id": venue.id,
+        "name": venue.name,
+        "genres": [genre.name for genre in venue.genres],
+        "address": venue.address,
+        "city": venue.city,
+        "state": venue.state,
+        "phone": venue.phone,
+        "website": venue.website,
+        "facebook_link": venue.facebook_link,
+        "seeking_talent": venue.seeking_talent,
+        "seeking_description": venue.seeking_description,
+        "image_link": venue.image_link,
+        "past_shows": [],
+        "upcoming_shows": [],
+    }
+    for show in sorted(venue.shows, key=lambda show: show.start_time):
+        shows = data["upcoming_shows"] if is_upcoming(show.start_time, now) else data["past_shows"]
+        shows.append({
+            "artist_id": show.artist_id,
+            "artist_name": show.artist.name,
+            "artist_image_link": show.artist.image_link,
+            "start_time": show.start_time,
+        })
+    data["past_shows_count"] = len(data["past_shows"])
+    data["upcoming_shows_count"] = len(data["upcoming_shows"])
+    return data
+
+@bp.route('/venues/<int:venue_id>')
+def show_venue(venue_id):
+    # shows the venue page with the given venue_id
+    key = 'venue:{}'.format(venue_id)
+
+    def render():
+        data = cache.get_or_set(conditional.cache_key(key, validator), (key,), lambda: load(venue_page(venue_id)))
+        return render_template('pages/show_venue.html', venue=data)
+
+    validator = load(entity_validator(Venue, venue_id))
+    return conditional.respond(render, validator, conditional.last_modified(*validator[:4]))
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@bp.route('/venues/create', methods=['GET'])
+def create_venue_form():
+  from forms import VenueForm
+  form = VenueForm()
+  return render_template('forms/new_venue.html', form=form)
+
+@bp.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+    # insert form data as a new Venue record in the db, instead
+    # modify data to be the data object returned from db insertion
+    from forms import VenueForm
+    form = VenueForm(request.form)
+    if form.validate_on_submit():
+        new_venue = Venue(
+            name = form.name.data,
+            city = form.city.data,
+            state = form.state.data,
+            address = form.address.data,
+            phone = form.phone.data,
+            image_link = form.image_link.data,
+            facebook_link = form.facebook_link.data,
+            website = form.website_link.data,
+            seeking_talent = form.seeking_talent.data,
+            seeking_description = form.seeking_description.data,
+        )
+        try:
+            genres.assign(new_venue, form.genres.data)
+            db.session.add(new_venue)
+            db.session.commit()
+            cache.bump('venues')
+            # on successful db insert, flash success
+            flash('Venue ' + request.form['name'] + ' was successfully listed!')
+        except:
+            db.session.rollback()
+            # on unsuccessful db insert, flash an error instead.
+            flash('An error occurred. Venue ' + request.form['name'] + ' could not be listed.')
+            # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+        finally:
+            db.session.close()
+    if form.errors != {}:
+        for error_message in form.errors.values():
+            flash(f'An error occurred on {error_message[0]}, Venue ' + request.form['name'] + ' could not be listed.')
+
+    return redirect(url_for('pages.index'))
+
+#  Delete Venue
+#  ----------------------------------------------------------------
+
+@bp.route('/venues/<venue_id>/delete', methods=['POST'])
+def delete_venue(venue_id):
+    # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+
+    try:
+        venue_to_delete = Venue.query.get(venue_id)
+        venue_to_delete_name = venue_to_delete.name
+        # the venue's shows are deleted with it, so its artists' counters change
+        artist_ids = {show.artist_id for show in venue_to_delete.shows}
+        db.session.delete(venue_to_delete)
+        db.session.flush()
+        counters.refresh(Artist, artist_ids)
+        db.session.commit()
+        cache.bump('venues', 'venue:{}'.format(venue_id), *('artist:{}'.format(id) for id in artist_ids))
+        flash('Venue ' + venue_to_delete_name + 'with ID: ' + venue_id + ' was successfully deleted!')
+    except:
+        db.session.rollback()
+        flash('please try again. Venue ' + venue_to_delete_name + 'with ID: ' + venue_id + ' could not be deleted.')
+    finally:
+        db.session.close()
+    # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+    # clicking that button delete it from the db then redirect the user to the homepage
+    return redirect(url_for('pages.index'))
+
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+    from forms import VenueForm
+    form = VenueForm()
+    venue = Venue.query.get(venue_id)
+    if venue:
+        form.name.data = venue.name
+        form.genres.data = [genre.name for genre in venue.genres]
+        form.address.data = venue.address
+        form.city.data = venue.city
+        form.state.data = venue.state
+        form.phone.data = venue.phone
+        form.website_link.data = venue.website
+        form.facebook_link.data = venue.facebook_link
+        form.seeking_talent.data = venue.seeking_talent
+        form.seeking_description.data = venue.seeking_description
+        form.image_link.data = venue.image_link
+        form.version.data = venue.version_id
+
+        # populate form with values from venue with ID <venue_id>
+        return render_template('forms/edit_venue.html', form=form, venue=venue)
+    return render_template('errors/404.html'), 404
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+    # take values from the form submitted, and update existing
+    # venue record with ID <venue_id> using the new attributes
+    from forms import VenueForm
+    form = VenueForm(request.form)
+    conflict = False
+    if form.validate_on_submit():
+        try:
+            venue = Venue.query.get(venue_id)
+            if is_stale(venue, form.version.data):
+                raise StaleDataError()
+            changed = apply_changes(venue, {
+                'name': form.name.data,
+                'city': form.city.data,
+                'state': form.state.data,
+                'address': form.address.data,
+                'phone': form.phone.data,
+                'image_link': form.image_link.data,
+                'facebook_link': form.facebook_link.data,
+                'website': form.website_link.data,
+                'seeking_talent': form.seeking_talent.data,
+                'seeking_description': form.seeking_description.data,
+            }, form.genres.data)
+
+            if changed:
+                # UPDATE ... WHERE id = ? AND version_id = ?: a concurrent
+                # edit committed in between raises StaleDataError
+                db.session.commit()
+                # artist pages list the venue's name and image
+                artist_ids = [id for (id,) in db.session.query(Show.artist_id).filter(Show.venue_id == venue_id).distinct()]
+                cache.bump('venues', 'venue:{}'.format(venue_id), *('artist:{}'.format(id) for id in artist_ids))
+            # on successful db insert, flash success
+            flash('Venue ' + request.form['name'] + ' was successfully edited!')
+        except StaleDataError:
+            db.session.rollback()
+            conflict = True
+            flash('Venue ' + request.form['name'] + ' was changed by someone else in the meantime. '
+                  'Review the current values and apply your changes again.')
+        except:
+            db.session.rollback()
+            flash('An error occurred. Venue ' + request.form['name'] + ' could not be edited.')
+            # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+        finally:
+            db.session.close()
+    if conflict:
+        return conflict_response(edit_venue, venue_id)
+    if form.errors != {}:
+        for error_message in form.errors.values():
+            flash(f'An error occurred on {error_message[0]}, Venue ' + request.form['name'] + ' could not be listed.')
+    return redirect(url_for('.show_venue', venue_id=venue_id))
+
+
+@bp.route('/venues/<int:venue_id>/availability')
+def venue_availability(venue_id):
+    return availability_response(Venue, venue_id)
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone
+
+from flask import abort, current_app, jsonify, make_response, request
+from sqlalchemy import case, select
+from sqlalchemy.sql import func
+
+import availability
+import genres
+from models import db, Deletion, Venue, Artist, Show
+
+#----------------------------------------------------------------------------#
+# Helpers shared by the blueprints.
+#----------------------------------------------------------------------------#
+
+def is_upcoming(start_time, now):
+    # naive timestamps (SQLite) are stored as UTC
+    if start_time.tzinfo is None:
+        start_time = start_time.replace(tzinfo=timezone.utc)
+    return start_time >= now
+
+def list_validator(*models):
+    # max(updated_at) and deletion count of each table in one round trip,
+    # both index-only; deletions move no updated_at but leave a Deletion row.
+    # A count, not max(deleted_at): it moves whatever order deletes commit in
+    columns = []
+    for model in models:
+        columns.append(select(func.max(model.updated_at)).scalar_subquery())
+        columns.append(select(func.count()).select_from(Deletion)
+                       .where(Deletion.table_name == model.__tablename__).scalar_subquery())
+    return tuple((yield select(*columns)).one())
+
+def entity_validator(model, id):
+    # everything a venue / artist page renders: the row itself, its shows,
+    # the other side of each show, and the latest show that moved into the past
+    other, key, other_key = (Artist, Show.venue_id, Show.artist_id) if model is Venue \
+        else (Venue, Show.artist_id, Show.venue_id)
+    now = datetime.now(timezone.utc)
+    row = (yield select(
+        model.updated_at,
+        func.max(Show.updated_at),
+        func.max(other.updated_at),
+        func.max(case((Show.start_time < now, Show.start_time))),
+        func.count(Show.id),
+    ).outerjoin(Show, key == model.id)
+     .outerjoin(other, other.id == other_key)
+     .where(model.id == id)
+     .group_by(model.id)).first()
+    if row is None:
+        abort(404)
+    return tuple(row)
+
+def availability_response(model, id):
+    # booked and free intervals of a venue / artist within ?from=&to=
+    # (ISO 8601, naive means UTC), the next AVAILABILITY_DEFAULT_DAYS by default
+    try:
+        start_time = availability.parse_time(request.args.get('from'), datetime.now(timezone.utc))
+        end_time = availability.parse_time(
+            request.args.get('to'), start_time + timedelta(days=current_app.config['AVAILABILITY_DEFAULT_DAYS']))
+    except ValueError:
+        abort(400)
+    if not start_time < end_time <= start_time + timedelta(days=current_app.config['AVAILABILITY_MAX_DAYS']):
+        abort(400)
+    if db.session.query(model.id).filter(model.id == id).first() is None:
+        abort(404)
+    booked, free = availability.calendar(model, id, start_time, end_time)
+    return jsonify({
+        "{}_id".format(model.__name__.lower()): id,
+        "from": start_time.isoformat(),
+        "to": end_time.isoformat(),
+        "booked": booked,
+        "free": free,
+    })
+
+def apply_changes(entity, values, genre_names):
+    # assigns only the attributes the form changed, so the UPDATE lists just
+    # those columns and an untouched form writes nothing; returns their names
+    changed = [name for name, value in values.items()
+               if getattr(entity, name) != value and not (getattr(entity, name) is None and value == '')]
+    for name in changed:
+        setattr(entity, name, values[name])
+    # genres_text mirrors the associations: no need to load them to compare
+    if entity.genres_text != ','.join(genre_names):
+        genres.assign(entity, genre_names)
+        changed.append('genres')
+    return changed
+
+def is_stale(entity, version):
+    # the edit form posts the version_id it was rendered with; posts without
+    # one (scripts, forms rendered before the column existed) are not checked
+    return bool(version) and version != str(entity.version_id)
+
+def conflict_response(view, id):
+    # the edit form again, with the current values and version, as a 409
+    response = make_response(view(id))
+    if response.status_code == 200:
+        response.status_code = 409
+    return response
@@ -0,0 +1,13 @@
+import os
+
+from app import create_app
+
+#----------------------------------------------------------------------------#
+# WSGI entry point.
+#
+# For production servers: `gunicorn -c gunicorn.conf.py` (which loads
+# wsgi:app) or any WSGI server pointed at wsgi:app. Unlike `flask run`,
+# it defaults to the production environment.
+#----------------------------------------------------------------------------#
+
+app = create_app(os.getenv('FLASK_ENV') or 'production')